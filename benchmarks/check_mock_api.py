@@ -0,0 +1,178 @@
+"""Check the API client's rate-limit handling against the mock GitHub API
+
+    python benchmarks/check_mock_api.py
+
+Starts a MockGitHubServer where tokens 'a' and 'p' have a much smaller quota than the
+others, then checks that a pool fails over to the next token, holds an exhausted token
+back until its reset, and raises RateLimitExceeded rather than sleeping when its only
+token is exhausted or paced further apart than the scheduler's max_wait. It
+also checks that batched GraphQL profile lookups resolve organizations and match the
+REST profiles, that only a REST 404 leaves a profile missing, and that lookups that
+fail for another reason are reported as failed rather than as missing accounts.
+Prints one line per check and exits with 1 if any of them failed, so it can gate CI.
+"""
+import os
+import shutil
+import sys
+import tempfile
+import time
+import traceback
+
+import requests
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+SCRIPTS_DIR = os.path.join(os.path.dirname(BENCHMARKS_DIR), 'scripts')
+
+sys.path.insert(0, SCRIPTS_DIR)
+
+from mock_github import MockGitHubServer
+
+# Quota of the tokens that run out first; every other token gets the mock's default
+SMALL_TOKEN_LIMIT = 5
+SMALL_TOKENS = ['a', 'p']
+
+def exhaust_token(server, token):
+    """Use up a token's quota outside any pool, as another client sharing it would"""
+    for i in range(SMALL_TOKEN_LIMIT):
+        requests.get(f"{server.url}/users/drain{i}", headers={'Authorization': f'token {token}'}, timeout=30)
+
+def check_single_token_exhausted(server):
+    """A pool of one exhausted token raises RateLimitExceeded instead of waiting for the reset"""
+    from github_api import RateLimitExceeded, RequestScheduler, get_token_pool, get_user_profile
+
+    exhaust_token(server, 'a')
+    try:
+        get_user_profile('single-over', get_token_pool(['a']), RequestScheduler())
+    except RateLimitExceeded:
+        pass
+    else:
+        raise AssertionError("no RateLimitExceeded once the only token was exhausted")
+
+def check_paced_token_gives_up(server):
+    """A token paced further apart than max_wait raises RateLimitExceeded instead of sleeping"""
+    from github_api import MAX_RATE_LIMIT_WAIT, RateLimitExceeded, RequestScheduler, get_token_pool, \
+        get_user_profile
+
+    token = get_token_pool(['p'])
+    scheduler = RequestScheduler()
+    server.reset_stats()
+    started = time.time()
+    sent = 0
+    try:
+        for i in range(SMALL_TOKEN_LIMIT):
+            assert get_user_profile(f"paced{i}", token, scheduler), f"request {i + 1} within the quota failed"
+            sent += 1
+    except RateLimitExceeded as e:
+        reset_at = e.reset_at
+    else:
+        raise AssertionError("the quota was used up without pacing")
+    stats = server.reset_stats()
+    assert time.time() - started < 10, "the pool slept through the pacing instead of giving up"
+    assert reset_at > started + MAX_RATE_LIMIT_WAIT, "RateLimitExceeded was raised with a slot within max_wait"
+    assert 0 < sent < SMALL_TOKEN_LIMIT and stats['status'] == {200: sent}, f"unexpected responses {stats}"
+
+def check_failover(server):
+    """A request refused for an exhausted token is retried right away with the next one"""
+    from github_api import RequestScheduler, get_token_pool, get_user_profile
+
+    # A new pool doesn't know 'a' is exhausted yet, so the first request goes to it
+    token = get_token_pool(['a', 'b'])
+    server.reset_stats()
+    profile = get_user_profile('failover', token, RequestScheduler())
+    stats = server.reset_stats()
+    assert profile and profile['login'] == 'failover', "the request wasn't answered after failing over"
+    assert stats['tokens'] == {'a': 1, 'b': 1}, f"expected one request per token, got {stats['tokens']}"
+    assert stats['status'] == {403: 1, 200: 1}, f"unexpected responses {stats['status']}"
+
+def check_exhausted_token_held_back(server):
+    """Once a token is known to be exhausted, no further requests are sent with it"""
+    from github_api import RequestScheduler, get_token_pool, get_user_profile
+
+    token = get_token_pool(['a', 'b'])
+    scheduler = RequestScheduler()
+    server.reset_stats()
+    for i in range(20):
+        assert get_user_profile(f"held{i}", token, scheduler), f"request {i + 1} failed"
+    stats = server.reset_stats()
+    assert stats['tokens'] == {'b': 20}, f"expected all 20 requests on 'b', got {stats['tokens']}"
+    quotas = {(status['token'], status['resource']): status['remaining'] for status in token.status()}
+    assert quotas[('…a', 'core')] == 0, f"pool doesn't record 'a' as exhausted: {quotas}"
+
+# Fields stored from a profile, which GraphQL and REST lookups must agree on
+PROFILE_KEYS = ['login', 'id', 'name', 'bio', 'avatar_url', 'location', 'public_repos']
+
+def check_graphql_profiles(server):
+    """GraphQL batches resolve users and organizations alike; unresolved logins go to REST"""
+    from github_api import RequestScheduler, fetch_user_profiles, get_user_profile
+
+    scheduler = RequestScheduler()
+    logins = ['user1', 'org-acme', 'ghost-gone']
+    expected = {login: get_user_profile(login, 'c', scheduler) for login in logins}
+    assert expected['org-acme'] and expected['ghost-gone'] is None, "mock REST profiles aren't as expected"
+
+    server.reset_stats()
+    profiles = dict(fetch_user_profiles(logins, 'c', scheduler=scheduler, use_graphql=True))
+    stats = server.reset_stats()
+    for login in ['user1', 'org-acme']:
+        assert profiles[login], f"no profile for {login}"
+        mismatched = [key for key in PROFILE_KEYS if profiles[login][key] != expected[login][key]]
+        assert not mismatched, f"GraphQL and REST disagree on {mismatched} of {login}"
+    assert profiles['ghost-gone'] is None, "a login that 404s over REST got a profile"
+    # One batch, then a single REST lookup for the login the batch couldn't resolve
+    assert stats['requests'] == 2, f"expected 2 requests, got {stats['requests']}"
+    assert stats['status'] == {200: 1, 404: 1}, f"unexpected responses {stats['status']}"
+
+def check_failed_lookups(server):
+    """A lookup that keeps failing is reported in failed, not yielded as a missing account"""
+    from github_api import RequestScheduler, fetch_user_profiles
+
+    # Don't sit through the retry backoff of the 502s
+    scheduler = RequestScheduler(max_retries=0)
+    failed = set()
+    profiles = dict(fetch_user_profiles(['user1', 'ghost-gone', 'broken-down'], 'c', scheduler=scheduler,
+                                        use_graphql=True, failed=failed))
+    assert profiles['user1'], "no profile for user1"
+    assert profiles['ghost-gone'] is None, "a login that 404s wasn't reported as missing"
+    assert 'broken-down' not in profiles, "a failed lookup was yielded as a missing account"
+    assert failed == {'broken-down'}, f"expected broken-down to fail, got {failed}"
+
+CHECKS = [
+    check_single_token_exhausted,
+    check_paced_token_gives_up,
+    check_failover,
+    check_exhausted_token_held_back,
+    check_graphql_profiles,
+    check_failed_lookups,
+]
+
+def main(argv=None):
+    server = MockGitHubServer(token_limits={token: SMALL_TOKEN_LIMIT for token in SMALL_TOKENS}).start()
+    os.environ['GITHUB_API_URL'] = server.url
+    os.environ.pop('GITHUB_GRAPHQL_URL', None)
+
+    # The response cache lives under ./data, so run inside a scratch directory
+    workdir = tempfile.mkdtemp(prefix='gfa-check-')
+    cwd = os.getcwd()
+    os.chdir(workdir)
+    failed = []
+    try:
+        for check in CHECKS:
+            try:
+                check(server)
+            except Exception:
+                failed.append(check.__name__)
+                print(f"FAIL {check.__name__}")
+                traceback.print_exc()
+            else:
+                print(f"ok   {check.__name__}")
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(workdir, ignore_errors=True)
+        server.shutdown()
+        server.server_close()
+
+    print(f"{len(CHECKS) - len(failed)}/{len(CHECKS)} checks passed")
+    return 1 if failed else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,292 @@
+"""Local stand-in for the parts of the GitHub API the analyzer uses, for benchmarks and offline testing
+
+    python benchmarks/mock_github.py --port 8000 --latency 50
+    GITHUB_API_URL=http://127.0.0.1:8000 streamlit run scripts/app.py
+
+The account net-<size> (e.g. net-1000, net-100000) has a synthetic network of <size>
+connections: the first two thirds follow it, the last two thirds are followed by it,
+so a third of the network is mutual. Every other login resolves to a small network of
+DEFAULT_NETWORK_SIZE. Logins starting with org- are organizations, which GraphQL only
+resolves through repositoryOwner, logins starting with ghost- don't exist and profiles
+of logins starting with broken- always fail with a 502. Serves
+paginated /users/{login}/followers and /following with Link headers, /users/{login}
+profiles and aliased GraphQL user/repositoryOwner lookups, with ETags, X-RateLimit-*
+headers and optional latency and secondary rate limiting.
+"""
+import argparse
+import hashlib
+import json
+import random
+import re
+import threading
+import time
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+DEFAULT_NETWORK_SIZE = 30
+
+# GitHub's defaults: 30 items per page unless per_page (at most 100) is given
+DEFAULT_PER_PAGE = 30
+MAX_PER_PAGE = 100
+
+DEFAULT_RATE_LIMIT = 5000
+DEFAULT_RATE_WINDOW = 3600
+
+LOCATIONS = ['Berlin', 'San Francisco', 'London', 'Bangalore', 'Tokyo', 'São Paulo', 'Toronto', '', None]
+
+def network_size(login):
+    """Number of connections of a synthetic account"""
+    match = re.fullmatch(r'net-(\d+)', login)
+    return int(match.group(1)) if match else DEFAULT_NETWORK_SIZE
+
+def connection_logins(login, relation):
+    """Range of user indices in login's followers or following list"""
+    size = network_size(login)
+    if relation == 'followers':
+        return range(0, (size * 2 + 2) // 3)
+    return range(size // 3, size)
+
+def is_organization(login):
+    """Whether a synthetic login is an organization rather than a user"""
+    return login.startswith('org-')
+
+def exists(login):
+    """Whether a synthetic login has an account; ghost-* logins answer 404"""
+    return not login.startswith('ghost-')
+
+def is_broken(login):
+    """Whether a synthetic login's profile lookups fail; broken-* logins answer 502"""
+    return login.startswith('broken-')
+
+def user_profile(login):
+    """Deterministic REST-shaped profile for any login"""
+    seed = zlib.crc32(login.encode())
+    return {
+        'login': login,
+        'id': seed,
+        'name': login.replace('-', ' ').title(),
+        'bio': f"Synthetic account {login}" if seed % 3 else None,
+        'avatar_url': f"https://avatars.githubusercontent.com/u/{seed}?v=4",
+        'location': LOCATIONS[seed % len(LOCATIONS)],
+        'public_repos': seed % 250,
+        'followers': len(connection_logins(login, 'followers')),
+        'following': len(connection_logins(login, 'following')),
+        'type': 'Organization' if is_organization(login) else 'User',
+    }
+
+class RateLimiter:
+    """Per-token, per-resource quota that resets every window seconds, like GitHub's primary limits"""
+    def __init__(self, limit=DEFAULT_RATE_LIMIT, window=DEFAULT_RATE_WINDOW, token_limits=None):
+        self.limit = limit
+        self.window = window
+        # Tokens with a quota other than limit, e.g. to exhaust one token of a pool early
+        self.token_limits = dict(token_limits or {})
+        self.lock = threading.Lock()
+        # {(token, resource): [used, reset_at]}
+        self.quotas = {}
+
+    def charge(self, token, resource, cost=1):
+        """Spend cost requests, returning (allowed, headers)"""
+        with self.lock:
+            now = time.time()
+            quota = self.quotas.get((token, resource))
+            if quota is None or quota[1] <= now:
+                quota = self.quotas[(token, resource)] = [0, int(now + self.window)]
+            limit = self.token_limits.get(token, self.limit)
+            allowed = quota[0] + cost <= limit
+            if allowed:
+                quota[0] += cost
+            used, reset_at = quota
+        return allowed, {
+            'X-RateLimit-Limit': str(limit),
+            'X-RateLimit-Remaining': str(limit - used),
+            'X-RateLimit-Used': str(used),
+            'X-RateLimit-Reset': str(reset_at),
+            'X-RateLimit-Resource': resource,
+        }
+
+class MockGitHubHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+    def _token(self):
+        auth = self.headers.get('Authorization', '')
+        return auth.split(' ', 1)[1] if ' ' in auth else f"anon:{self.client_address[0]}"
+
+    def _send(self, status, body=None, headers=None, token=None):
+        payload = json.dumps(body).encode() if body is not None else b''
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(payload)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(payload)
+        self.server.record(status, len(payload), token)
+
+    def _handle(self, resource, respond):
+        """Apply latency and rate limits, then send what respond() returns"""
+        if self.server.latency:
+            time.sleep(self.server.latency)
+        if self.server.throttle_rate and random.random() < self.server.throttle_rate:
+            self._send(429, {'message': 'You have exceeded a secondary rate limit.'}, {'Retry-After': '1'})
+            return
+        # Conditional requests that come back 304 don't count against the quota on GitHub
+        status, body, headers = respond()
+        token = self._token()
+        allowed, limit_headers = self.server.limiter.charge(token, resource, 0 if status == 304 else 1)
+        if not allowed:
+            self._send(403, {'message': 'API rate limit exceeded.'}, limit_headers, token)
+            return
+        self._send(status, body, {**headers, **limit_headers}, token)
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        parts = url.path.strip('/').split('/')
+        if len(parts) == 2 and parts[0] == 'users' and not exists(parts[1]):
+            self._handle('core', lambda: (404, {'message': 'Not Found'}, {}))
+        elif len(parts) == 2 and parts[0] == 'users' and is_broken(parts[1]):
+            self._handle('core', lambda: (502, {'message': 'Server Error'}, {}))
+        elif len(parts) == 2 and parts[0] == 'users':
+            self._handle('core', lambda: self._conditional(user_profile(parts[1])))
+        elif len(parts) == 3 and parts[0] == 'users' and parts[2] in ('followers', 'following'):
+            self._handle('core', lambda: self._connections(parts[1], parts[2], parse_qs(url.query)))
+        else:
+            self._send(404, {'message': 'Not Found'})
+
+    def do_POST(self):
+        if urlsplit(self.path).path.strip('/') != 'graphql':
+            self._send(404, {'message': 'Not Found'})
+            return
+        length = int(self.headers.get('Content-Length', 0))
+        request = json.loads(self.rfile.read(length) or b'{}')
+        self._handle('graphql', lambda: (200, self._graphql(request), {}))
+
+    def _conditional(self, body, headers=None):
+        """200 with an ETag, or 304 if the client already has this representation"""
+        etag = '"%s"' % hashlib.sha1(json.dumps(body, sort_keys=True).encode()).hexdigest()
+        headers = {**(headers or {}), 'ETag': etag}
+        if self.headers.get('If-None-Match') == etag:
+            return 304, None, headers
+        return 200, body, headers
+
+    def _connections(self, login, relation, query):
+        per_page = min(int(query.get('per_page', [DEFAULT_PER_PAGE])[0]), MAX_PER_PAGE)
+        page = max(int(query.get('page', ['1'])[0]), 1)
+        indices = connection_logins(login, relation)
+        last = max(1, -(-len(indices) // per_page))
+        items = [
+            {'login': f"user{i}", 'id': zlib.crc32(f"user{i}".encode()), 'type': 'User'}
+            for i in indices[(page - 1) * per_page:page * per_page]
+        ]
+        base = f"http://{self.headers.get('Host')}/users/{login}/{relation}?per_page={per_page}"
+        links = []
+        if page < last:
+            links.append(f'<{base}&page={page + 1}>; rel="next"')
+            links.append(f'<{base}&page={last}>; rel="last"')
+        if page > 1:
+            links.append(f'<{base}&page={page - 1}>; rel="prev"')
+            links.append(f'<{base}&page=1>; rel="first"')
+        return self._conditional(items, {'Link': ', '.join(links)} if links else None)
+
+    @staticmethod
+    def _graphql(request):
+        """Answer aliased `uN: repositoryOwner(login: $lN)` lookups as sent by get_user_profiles_graphql
+        
+        `user(login:)` lookups are answered too, with null for organizations like on GitHub.
+        """
+        variables = request.get('variables') or {}
+        data = {}
+        for alias, field, variable in re.findall(r'(\w+): (user|repositoryOwner)\(login: \$(\w+)\)',
+                                                 request.get('query', '')):
+            login = variables[variable]
+            if not exists(login) or is_broken(login) or (field == 'user' and is_organization(login)):
+                data[alias] = None
+                continue
+            profile = user_profile(login)
+            data[alias] = {
+                'login': profile['login'],
+                'databaseId': profile['id'],
+                'name': profile['name'],
+                'bio': profile['bio'],
+                'avatarUrl': profile['avatar_url'],
+                'location': profile['location'],
+                'repositories': {'totalCount': profile['public_repos']},
+            }
+        return {'data': data}
+
+class MockGitHubServer(ThreadingHTTPServer):
+    """Threaded mock API server that counts the requests and bytes it serves"""
+    daemon_threads = True
+
+    def __init__(self, address=('127.0.0.1', 0), latency=0.0, rate_limit=DEFAULT_RATE_LIMIT,
+                 rate_window=DEFAULT_RATE_WINDOW, throttle_rate=0.0, verbose=False, token_limits=None):
+        super().__init__(address, MockGitHubHandler)
+        self.latency = latency
+        self.throttle_rate = throttle_rate
+        self.limiter = RateLimiter(rate_limit, rate_window, token_limits)
+        self.verbose = verbose
+        self.stats_lock = threading.Lock()
+        self.stats = {}
+        self.reset_stats()
+
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def record(self, status, size, token=None):
+        with self.stats_lock:
+            self.stats['requests'] += 1
+            self.stats['bytes'] += size
+            self.stats['status'][status] = self.stats['status'].get(status, 0) + 1
+            if token is not None:
+                self.stats['tokens'][token] = self.stats['tokens'].get(token, 0) + 1
+
+    def reset_stats(self):
+        """Return the counters collected so far and start new ones"""
+        with self.stats_lock:
+            stats, self.stats = self.stats, {'requests': 0, 'bytes': 0, 'status': {}, 'tokens': {}}
+        return stats
+
+    def start(self):
+        """Serve from a daemon thread and return self"""
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Serve a synthetic GitHub API for benchmarks")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--latency', type=float, default=0.0,
+                        help="Milliseconds added to every response")
+    parser.add_argument('--rate-limit', type=int, default=DEFAULT_RATE_LIMIT,
+                        help="Requests per token and resource in each rate-limit window")
+    parser.add_argument('--rate-window', type=int, default=DEFAULT_RATE_WINDOW,
+                        help="Seconds until the rate limit resets")
+    parser.add_argument('--throttle-rate', type=float, default=0.0,
+                        help="Fraction of requests answered with a secondary rate limit (429, Retry-After: 1)")
+    parser.add_argument('--token-limit', action='append', default=[], metavar='TOKEN=LIMIT',
+                        help="Different rate limit for one token; repeatable")
+    parser.add_argument('-v', '--verbose', action='store_true', help="Log every request")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    token_limits = {token: int(limit) for token, limit in (item.rsplit('=', 1) for item in args.token_limit)}
+    server = MockGitHubServer((args.host, args.port), args.latency / 1000, args.rate_limit,
+                              args.rate_window, args.throttle_rate, args.verbose, token_limits)
+    print(f"Mock GitHub API listening on {server.url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,230 @@
+"""Time the fetch, store and analysis stages against the mock GitHub API at several network sizes
+
+    python benchmarks/run_benchmarks.py                          # 1k, 10k and 100k connections
+    python benchmarks/run_benchmarks.py --sizes 1000 5000 --latency 20 --no-graphql
+    python benchmarks/run_benchmarks.py --compare benchmarks/results/baseline.json
+    python benchmarks/run_benchmarks.py --sizes 10000 --token a --token b --token c
+
+Every run uses a throwaway data directory and writes a JSON file with per-stage
+timings plus the requests and bytes the mock server answered during each stage.
+With --compare, stages that got slower than --tolerance times the baseline are
+reported and the exit code is 1, so the script can gate CI.
+"""
+import argparse
+import json
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+SCRIPTS_DIR = os.path.join(os.path.dirname(BENCHMARKS_DIR), 'scripts')
+RESULTS_DIR = os.path.join(BENCHMARKS_DIR, 'results')
+
+sys.path.insert(0, SCRIPTS_DIR)
+
+from mock_github import DEFAULT_RATE_LIMIT, DEFAULT_RATE_WINDOW, MockGitHubServer
+
+DEFAULT_SIZES = [1000, 10000, 100000]
+
+# Stages that don't touch the network are repeated and the fastest run is kept
+DEFAULT_REPEAT = 3
+
+class StageTimer:
+    """Collects wall time and mock-server traffic for each named stage"""
+    def __init__(self, server):
+        self.server = server
+        self.stages = {}
+
+    @contextmanager
+    def stage(self, name):
+        self.server.reset_stats()
+        started = time.perf_counter()
+        yield
+        seconds = time.perf_counter() - started
+        traffic = self.server.reset_stats()
+        previous = self.stages.get(name)
+        if previous is None or seconds < previous['seconds']:
+            self.stages[name] = {
+                'seconds': round(seconds, 6),
+                'requests': traffic['requests'],
+                'bytes': traffic['bytes'],
+                'status': {str(code): count for code, count in traffic['status'].items()},
+            }
+
+def benchmark_size(size, args, server):
+    """Run every stage for the synthetic account net-<size> and return its timings"""
+    # Imported here so GITHUB_API_URL already points at the mock server
+    from database import connections_cache, get_account_overview, get_analyzed_users, get_connections_page, \
+        get_network_growth, get_user_connections, get_user_summary
+    from github_api import RequestScheduler, get_github_data, get_token_pool
+    from metrics import NetworkMetrics, NetworkSummary
+    from pipeline import refresh_account, save_to_database
+
+    username = f"net-{size}"
+    timer = StageTimer(server)
+    scheduler = RequestScheduler(pool_size=args.max_workers)
+    token = get_token_pool(args.tokens)
+
+    with timer.stage('get_github_data'):
+        data = get_github_data(username, token, scheduler, max_workers=args.max_workers)
+    with timer.stage('save_to_database'):
+        save_to_database(data, username, token, args.max_workers, scheduler,
+                         use_graphql=args.use_graphql, incremental=False)
+    with timer.stage('incremental_refresh'):
+        refresh_account(username, token, scheduler, args.max_workers, args.use_graphql, incremental=True,
+                        full_refresh_hours=0)
+    # Nothing changed, so this is the single /users probe
+    with timer.stage('probe_refresh'):
+        refresh_account(username, token, scheduler, args.max_workers, args.use_graphql, incremental=True)
+
+    for _ in range(args.repeat):
+        connections_cache.invalidate(username)
+        with timer.stage('get_user_connections'):
+            connections = get_user_connections(username)
+        with timer.stage('get_user_connections_cached'):
+            get_user_connections(username)
+        with timer.stage('network_metrics'):
+            metrics = NetworkMetrics(connections)
+        # What the app renders from: the aggregates stored at ingest
+        with timer.stage('network_summary'):
+            NetworkSummary(get_user_summary(username))
+        # Per-tab work on top of the shared NetworkMetrics, mirroring the show_*_tab functions
+        with timer.stage('overview_tab'):
+            metrics.summary()
+            metrics.top_follow_back_opportunities.to_dict('records')
+            get_connections_page(username, 'all', 'username', 24, 0)
+        with timer.stage('not_following_back_tab'):
+            metrics.top_not_following_back.to_dict('records')
+            get_connections_page(username, 'not_following_back', 'username', 24, 0)
+        with timer.stage('visualizations_tab'):
+            metrics.location_counts.head(10)
+            connections['public_repos'].describe()
+        # Full-text search plus indexed filters, as run by the card and table views
+        with timer.stage('search'):
+            get_connections_page(username, 'all', 'relevance', 24, 0, query='berlin')
+            get_connections_page(username, 'follow_back', 'public_repos', 24, 0, location='Tokyo', min_repos=100)
+        with timer.stage('history_tab'):
+            get_network_growth(username)
+            get_analyzed_users()
+            get_account_overview()
+
+    return {
+        'size': size,
+        'followers': len(data['followers']),
+        'following': len(data['following']),
+        'stages': timer.stages,
+    }
+
+def compare_results(results, baseline, tolerance):
+    """Print stage timings against a baseline run, returning the stages that regressed"""
+    if baseline.get('config') != results['config']:
+        print("Warning: the baseline was run with different settings; ratios may not be meaningful")
+    baseline_runs = {run['size']: run['stages'] for run in baseline['runs']}
+    regressions = []
+    for run in results['runs']:
+        previous = baseline_runs.get(run['size'])
+        if not previous:
+            continue
+        for name, stage in run['stages'].items():
+            if name not in previous:
+                continue
+            ratio = stage['seconds'] / max(previous[name]['seconds'], 1e-9)
+            flag = ''
+            if ratio > tolerance:
+                flag = '  REGRESSION'
+                regressions.append((run['size'], name, ratio))
+            print(f"{run['size']:>8} {name:<30} {previous[name]['seconds']:>10.4f}s -> "
+                  f"{stage['seconds']:>10.4f}s  x{ratio:.2f}{flag}")
+    return regressions
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the analyzer against a local mock GitHub API")
+    parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES,
+                        help="Network sizes (connections per account) to benchmark")
+    parser.add_argument('--latency', type=float, default=0.0,
+                        help="Milliseconds of latency the mock adds to every response")
+    parser.add_argument('--rate-limit', type=int, default=DEFAULT_RATE_LIMIT * 100,
+                        help="Requests per rate-limit window the mock allows each token")
+    parser.add_argument('--rate-window', type=int, default=DEFAULT_RATE_WINDOW,
+                        help="Seconds until the mock's rate limits reset")
+    parser.add_argument('--throttle-rate', type=float, default=0.0,
+                        help="Fraction of requests the mock answers with a secondary rate limit")
+    parser.add_argument('--max-workers', type=int, default=16, help="Concurrent requests per account")
+    parser.add_argument('--no-graphql', dest='use_graphql', action='store_false',
+                        help="Fetch profiles with one REST call each instead of batched GraphQL")
+    parser.add_argument('--token', dest='tokens', action='append',
+                        help="Token sent to the mock server; repeat to benchmark a token pool")
+    parser.add_argument('--repeat', type=int, default=DEFAULT_REPEAT,
+                        help="Runs of each local stage; the fastest is reported")
+    parser.add_argument('-o', '--output', help="Results file (defaults to benchmarks/results/<timestamp>.json)")
+    parser.add_argument('--compare', help="Earlier results file to compare against")
+    parser.add_argument('--tolerance', type=float, default=1.25,
+                        help="Slowdown ratio against --compare that counts as a regression")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    args.tokens = args.tokens or ['benchmark-token']
+    server = MockGitHubServer(latency=args.latency / 1000, rate_limit=args.rate_limit,
+                              rate_window=args.rate_window, throttle_rate=args.throttle_rate).start()
+    os.environ['GITHUB_API_URL'] = server.url
+    os.environ.pop('GITHUB_GRAPHQL_URL', None)
+
+    output = os.path.abspath(args.output or os.path.join(
+        RESULTS_DIR, f"{datetime.now().strftime('%Y%m%d-%H%M%S')}.json"))
+    # The app keeps its database and caches under ./data, so run inside a scratch directory
+    workdir = tempfile.mkdtemp(prefix='gfa-bench-')
+    cwd = os.getcwd()
+    os.chdir(workdir)
+    try:
+        from database import initialize_database
+        initialize_database()
+        runs = []
+        for size in sorted(args.sizes):
+            print(f"Benchmarking {size} connections...", flush=True)
+            run = benchmark_size(size, args, server)
+            runs.append(run)
+            for name, stage in run['stages'].items():
+                print(f"  {name:<30} {stage['seconds']:>10.4f}s  {stage['requests']:>7} requests")
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(workdir, ignore_errors=True)
+        server.shutdown()
+        server.server_close()
+
+    results = {
+        'created_at': datetime.now().isoformat(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'config': {
+            'latency_ms': args.latency,
+            'rate_limit': args.rate_limit,
+            'tokens': len(args.tokens),
+            'throttle_rate': args.throttle_rate,
+            'max_workers': args.max_workers,
+            'use_graphql': args.use_graphql,
+            'repeat': args.repeat,
+        },
+        'runs': runs,
+    }
+    os.makedirs(os.path.dirname(output), exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(f"Results written to {output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressions = compare_results(results, baseline, args.tolerance)
+        if regressions:
+            print(f"{len(regressions)} stage(s) slower than x{args.tolerance} of the baseline")
+            return 1
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,346 +1,252 @@
+import os
 import streamlit as st
 import requests
-import os
 import matplotlib.pyplot as plt
 import seaborn as sns
 import pandas as pd
-import sqlite3
 from datetime import datetime
 import numpy as np
 import plotly.express as px
 
-@st.cache_data
-def fetch_all_pages(url, headers):
-    results = []
-    while url:
-        response = requests.get(url, headers=headers)
-        if response.status_code != 200:
-            return None
-        results.extend(response.json())
-        url = response.links.get('next', {}).get('url')
-    return results
+from avatars import get_avatar_cache
+from crawler import (
+    DEFAULT_CRAWL_DEPTH,
+    DEFAULT_CRAWL_MAX_PAGES,
+    DEFAULT_CRAWL_NODE_BUDGET,
+    crawl_network,
+    get_crawl_edges,
+    get_crawl_status,
+    reset_crawl,
+)
+from database import (
+    DEFAULT_FULL_REFRESH_HOURS,
+    DEFAULT_PROFILE_TTL_HOURS,
+    get_account_overview,
+    get_analyzed_users,
+    get_connections_as_of,
+    get_connections_page,
+    get_location_options,
+    get_latest_perf_run,
+    get_logins,
+    get_network_growth,
+    get_perf_runs,
+    get_user_connections,
+    get_user_summary,
+    initialize_database,
+    record_perf_run,
+)
+from github_api import (
+    DEFAULT_MAX_WORKERS,
+    PER_PAGE,
+    RateLimitExceeded,
+    RequestScheduler,
+    get_token_pool,
+    parse_tokens,
+)
+from graph import FollowGraph
+from exports import EXPORT_DATASETS, EXPORT_FORMATS, available_formats, export_dataset
+from instrumentation import perf, perf_run
+from metrics import NetworkMetrics, NetworkSummary
+from network_sets import RELATIONS, SetComparison
+from worker import ACTIVE_JOB_STATUSES, cancel_job, get_jobs, get_refresh_worker, get_schedule, set_schedule
 
-def get_user_profile(username, token=None):
-    """Fetch detailed profile information for a given username"""
-    headers = {'Authorization': f'token {token}'} if token else {}
-    url = f"https://api.github.com/users/{username}"
-    response = requests.get(url, headers=headers)
-    if response.status_code == 200:
-        return response.json()
-    return None
+def show_export_section(current_username):
+    """Write an export file only when asked, then offer it for download once"""
+    st.write("#### Export")
+    col1, col2, col3 = st.columns([2, 1, 1], vertical_alignment="bottom")
+    with col1:
+        dataset = st.selectbox("Data", list(EXPORT_DATASETS), key="export_dataset",
+                               format_func=lambda name: EXPORT_DATASETS[name]['label'])
+    with col2:
+        fmt = st.selectbox("Format", available_formats(), key="export_format",
+                           format_func=lambda name: EXPORT_FORMATS[name]['label'])
+    with col3:
+        if st.button("Prepare Export"):
+            with st.spinner("Writing export..."):
+                path, count = export_dataset(dataset, current_username, fmt)
+            st.session_state.export = {'key': (current_username, dataset, fmt), 'path': path, 'count': count}
+    
+    export = st.session_state.get('export')
+    if export and export['key'] == (current_username, dataset, fmt) and os.path.exists(export['path']):
+        with open(export['path'], 'rb') as f:
+            st.download_button(
+                label=f"Download {export['count']} rows",
+                data=f,
+                file_name=f"github_data_{current_username}_{dataset}.{EXPORT_FORMATS[fmt]['extension']}",
+                mime=EXPORT_FORMATS[fmt]['mime'],
+                # Forget the file once downloaded so later reruns don't read it again
+                on_click=lambda: st.session_state.pop('export', None)
+            )
 
-def get_github_data(username, token=None):
-    headers = {'Authorization': f'token {token}'} if token else {}
-    base_url = f"https://api.github.com/users/{username}"
-    followers = fetch_all_pages(f"{base_url}/followers", headers)
-    following = fetch_all_pages(f"{base_url}/following", headers)
-    
-    if followers is not None and following is not None:
-        return {
-            'followers': [f['login'] for f in followers],
-            'following': [f['login'] for f in following]
-        }
-    return None
+def render_profile_card(user, status_text=None):
+    """HTML for one profile card, colored by follow status"""
+    # Determine card color based on follow status
+    card_color = "#FFFFFF"  # Default white (they follow you, you don't follow them)
+    if user['following'] and not user['follower']:
+        card_color = "#FFCCCC"  # Red (you follow them, they don't follow back)
+    elif user['following'] and user['follower']:
+        card_color = "#CCFFCC"  # Green (mutual follow)
+    
+    if status_text is None:
+        status_text = ' • '.join(filter(None, [
+            'Following' if user['following'] else None,
+            'Follower' if user['follower'] else None
+        ]))
+    
+    return f"""
+    <div style="padding: 1rem; border: 1px solid #ddd; border-radius: 8px; margin-bottom: 1rem; background-color: {card_color};">
+        <div style="display: flex; align-items: center; margin-bottom: 10px">
+            <img src="{get_avatar_cache().data_uri(user['avatar_url'])}" style="width: 60px; height: 60px; border-radius: 50%; margin-right: 10px">
+            <div>
+                <h3 style="margin: 0">{user['username']}</h3>
+                <p style="margin: 0; color: #666">{user['name'] or ''}</p>
+            </div>
+        </div>
+        <p style="margin: 5px 0">{user['bio'] or ''}</p>
+        <p style="margin: 5px 0">📍 {user['location'] or 'No location'}</p>
+        <p style="margin: 5px 0">📚 {user['public_repos']} public repos</p>
+        <p style="margin: 5px 0">Status: {status_text}</p>
+        <a href="{user['link']}" target="_blank">View Profile</a>
+    </div>
+    """
 
-def initialize_database():
-    """Initialize SQLite database with necessary tables"""
-    # Ensure the data directory exists
-    os.makedirs("data", exist_ok=True)
-    
-    # Connect to the database (will create it if it doesn't exist)
-    conn = sqlite3.connect('data/github_followers.db')
-    cursor = conn.cursor()
-    
-    # Create main_users table to store the users we've analyzed
-    cursor.execute('''
-    CREATE TABLE IF NOT EXISTS main_users (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        username TEXT UNIQUE,
-        last_updated TIMESTAMP
-    )
-    ''')
-    
-    # Create connections table to store follower/following relationships
-    cursor.execute('''
-    CREATE TABLE IF NOT EXISTS github_users (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        username TEXT UNIQUE,
-        name TEXT,
-        bio TEXT,
-        avatar_url TEXT,
-        location TEXT,
-        public_repos INTEGER,
-        last_updated TIMESTAMP
-    )
-    ''')
-    
-    # Create connections table to store follower/following relationships
-    cursor.execute('''
-    CREATE TABLE IF NOT EXISTS connections (
-        main_user TEXT,
-        related_user TEXT,
-        is_following BOOLEAN,
-        is_follower BOOLEAN,
-        last_updated TIMESTAMP,
-        PRIMARY KEY (main_user, related_user)
-    )
-    ''')
-    
-    conn.commit()
-    conn.close()
+CARD_FILTERS = {
+    'all': "Everyone",
+    'mutual': "Mutual",
+    'not_following_back': "Not following back",
+    'follow_back': "Follow-back opportunities",
+}
 
-def save_to_database(data, username, token=None):
-    """Save GitHub data to SQLite database"""
-    conn = sqlite3.connect('data/github_followers.db')
-    cursor = conn.cursor()
-    
-    # Update or insert the main user
-    current_time = datetime.now().isoformat()
-    cursor.execute('''
-    INSERT OR REPLACE INTO main_users (username, last_updated)
-    VALUES (?, ?)
-    ''', (username, current_time))
-    
-    # Get all users (followers and following)
-    all_users = set(data['followers']) | set(data['following'])
-    
-    # Show progress bar while fetching user data
-    progress_bar = st.progress(0)
-    
-    for i, user in enumerate(all_users):
-        # Fetch profile information
-        profile = get_user_profile(user, token)
-        
-        if profile:
-            # Insert or update user data
-            cursor.execute('''
-            INSERT OR REPLACE INTO github_users 
-            (username, name, bio, avatar_url, location, public_repos, last_updated)
-            VALUES (?, ?, ?, ?, ?, ?, ?)
-            ''', (
-                user,
-                profile.get('name', ''),
-                profile.get('bio', ''),
-                profile.get('avatar_url', ''),
-                profile.get('location', ''),
-                profile.get('public_repos', 0),
-                current_time
-            ))
-        else:
-            # Insert with minimal data if profile fetch failed
-            cursor.execute('''
-            INSERT OR REPLACE INTO github_users 
-            (username, last_updated)
-            VALUES (?, ?)
-            ''', (user, current_time))
-        
-        # Insert or update connection data
-        cursor.execute('''
-        INSERT OR REPLACE INTO connections
-        (main_user, related_user, is_following, is_follower, last_updated)
-        VALUES (?, ?, ?, ?, ?)
-        ''', (
-            username,
-            user,
-            user in data['following'],
-            user in data['followers'],
-            current_time
-        ))
-        
-        # Update progress bar
-        progress_bar.progress((i + 1) / len(all_users))
+CARD_SORTS = {
+    'relevance': "Best match",
+    'username': "Username",
+    'public_repos': "Public repos",
+    'name': "Name",
+}
+
+def render_profile_cards(current_username, key, status=None, status_text=None, as_table=False):
+    """Render one page of profile cards, fetched from the database with LIMIT/OFFSET
     
-    conn.commit()
-    conn.close()
-    progress_bar.empty()
+    Only the visible page is queried and turned into HTML, so the cost doesn't grow
+    with the size of the network. Search and filters run in the same SQL query. Pass
+    status to pin the follow-status filter, or as_table to show the page as a table.
+    """
+    page_key = f"{key}_page"
     
-    return True
-
-def get_analyzed_users():
-    """Get list of users that have been analyzed"""
-    conn = sqlite3.connect('data/github_followers.db')
-    cursor = conn.cursor()
+    def reset_page():
+        st.session_state[page_key] = 1
     
-    cursor.execute('''
-    SELECT username, last_updated FROM main_users
-    ORDER BY last_updated DESC
-    ''')
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        if status is None:
+            status = st.selectbox("Show", list(CARD_FILTERS), format_func=CARD_FILTERS.get,
+                                  key=f"{key}_status", on_change=reset_page)
+    with col2:
+        sort = st.selectbox("Sort by", list(CARD_SORTS), format_func=CARD_SORTS.get, index=1,
+                            key=f"{key}_sort", on_change=reset_page,
+                            help="Best match applies while searching")
+    with col3:
+        page_sizes = [50, 100, 250, 500] if as_table else [12, 24, 48, 96]
+        page_size = st.selectbox("Rows per page" if as_table else "Cards per page", page_sizes, index=1,
+                                 key=f"{key}_page_size", on_change=reset_page)
     
-    users = cursor.fetchall()
-    conn.close()
+    col1, col2, col3, col4 = st.columns([3, 2, 1, 1])
+    with col1:
+        query = st.text_input("Search", key=f"{key}_query", on_change=reset_page,
+                              placeholder="Name, bio, location or username")
+    with col2:
+        location = st.selectbox("Location", [None] + get_location_options(current_username),
+                                format_func=lambda value: "Anywhere" if value is None else value,
+                                key=f"{key}_location", on_change=reset_page)
+    with col3:
+        min_repos = st.number_input("Min repos", min_value=0, value=0, key=f"{key}_min_repos", on_change=reset_page)
+    with col4:
+        max_repos = st.number_input("Max repos", min_value=0, value=None, key=f"{key}_max_repos",
+                                    on_change=reset_page, placeholder="Any")
+    filters = {'query': query, 'location': location, 'min_repos': min_repos or None, 'max_repos': max_repos}
+    
+    page = st.session_state.setdefault(page_key, 1)
+    users, total = get_connections_page(current_username, status, sort, page_size, (page - 1) * page_size,
+                                        **filters)
+    page_count = max(1, -(-total // page_size))
+    if page > page_count:
+        # The network shrank since this page was picked; show the last page instead
+        page = st.session_state[page_key] = page_count
+        users, total = get_connections_page(current_username, status, sort, page_size, (page - 1) * page_size,
+                                            **filters)
+    
+    if users.empty:
+        st.info("No connections match these filters.")
+    elif as_table:
+        st.dataframe(users, use_container_width=True, hide_index=True)
+    else:
+        # Display profile cards in a grid
+        cols = st.columns(3)
+        for idx, user in enumerate(users.to_dict('records')):
+            with cols[idx % 3]:
+                with st.container():
+                    st.markdown(render_profile_card(user, status_text), unsafe_allow_html=True)
     
-    return users
+    st.number_input(f"Page (of {page_count}, {total} users)", min_value=1, max_value=page_count, key=page_key)
 
-def get_user_connections(username):
-    """Get connections data for a specific user"""
-    conn = sqlite3.connect('data/github_followers.db')
-    conn.row_factory = sqlite3.Row  # This enables column access by name
-    cursor = conn.cursor()
-    
-    cursor.execute('''
-    SELECT 
-        c.related_user as username,
-        c.is_following as following,
-        c.is_follower as follower,
-        u.name,
-        u.bio,
-        u.avatar_url,
-        u.location,
-        u.public_repos,
-        'https://github.com/' || c.related_user as link
-    FROM connections c
-    JOIN github_users u ON c.related_user = u.username
-    WHERE c.main_user = ?
-    ''', (username,))
-    
-    connections = [dict(row) for row in cursor.fetchall()]
-    
-    # Convert boolean integers to 'Yes'/'No' strings for consistency with previous code
-    for conn_data in connections:
-        conn_data['following'] = 'Yes' if conn_data['following'] else 'No'
-        conn_data['follower'] = 'Yes' if conn_data['follower'] else 'No'
-    
-    conn.close()
-    return connections
+def load_metrics(username):
+    """Metrics from the summary stored at ingest, or from the connection rows if there is none yet"""
+    summary = get_user_summary(username)
+    if summary is not None:
+        return NetworkSummary(summary)
+    return NetworkMetrics(get_user_connections(username))
 
-def export_connections_to_csv(username):
-    """Export connections data to CSV"""
-    connections = get_user_connections(username)
-    df = pd.DataFrame(connections)
-    
-    csv = df.to_csv(index=False)
-    return csv
-
-def show_overview_tab(connections_data, current_username):
-    following_count = sum(1 for row in connections_data if row['following'] == 'Yes')
-    followers_count = sum(1 for row in connections_data if row['follower'] == 'Yes')
-    not_following_back = [row for row in connections_data if row['following'] == 'Yes' and row['follower'] == 'No']
-    
+def show_overview_tab(metrics, current_username):
     metrics_col1, metrics_col2, metrics_col3, metrics_col4 = st.columns(4)
     with metrics_col1:
-        st.metric("Following", following_count)
+        st.metric("Following", metrics.following_count)
     with metrics_col2:
-        st.metric("Followers", followers_count)
+        st.metric("Followers", metrics.followers_count)
     with metrics_col3:
-        st.metric("Not Following Back", len(not_following_back))
+        st.metric("Not Following Back", metrics.only_following_count)
     with metrics_col4:
-        if following_count > 0:
-            st.metric("Followers/Following Ratio", f"{(followers_count / following_count):.2f}")
+        if metrics.following_count > 0:
+            st.metric("Followers/Following Ratio", f"{metrics.influence_ratio:.2f}")
     
     # Add profile cards view option
     view_type = st.radio("Select View", ["Table", "Profile Cards"], horizontal=True)
     
     if view_type == "Table":
-        st.dataframe(connections_data, use_container_width=True)
+        render_profile_cards(current_username, key="overview_table", as_table=True)
     else:
-        # Display profile cards in a grid
-        cols = st.columns(3)
-        for idx, user in enumerate(connections_data):
-            with cols[idx % 3]:
-                # Determine card color based on follow status
-                card_color = "#FFFFFF"  # Default white (they follow you, you don't follow them)
-                if user['following'] == 'Yes' and user['follower'] == 'No':
-                    card_color = "#FFCCCC"  # Red (you follow them, they don't follow back)
-                elif user['following'] == 'Yes' and user['follower'] == 'Yes':
-                    card_color = "#CCFFCC"  # Green (mutual follow)
-                
-                with st.container():
-                    st.markdown(
-                        f"""
-                        <div style="padding: 1rem; border: 1px solid #ddd; border-radius: 8px; margin-bottom: 1rem; background-color: {card_color};">
-                            <div style="display: flex; align-items: center; margin-bottom: 10px">
-                                <img src="{user['avatar_url']}" style="width: 60px; height: 60px; border-radius: 50%; margin-right: 10px">
-                                <div>
-                                    <h3 style="margin: 0">{user['username']}</h3>
-                                    <p style="margin: 0; color: #666">{user['name'] or ''}</p>
-                                </div>
-                            </div>
-                            <p style="margin: 5px 0">{user['bio'] or ''}</p>
-                            <p style="margin: 5px 0">📍 {user['location'] or 'No location'}</p>
-                            <p style="margin: 5px 0">📚 {user['public_repos']} public repos</p>
-                            <p style="margin: 5px 0">Status: {' • '.join(filter(None, [
-                                'Following' if user['following'] == 'Yes' else None,
-                                'Follower' if user['follower'] == 'Yes' else None
-                            ]))}</p>
-                            <a href="{user['link']}" target="_blank">View Profile</a>
-                        </div>
-                        """,
-                        unsafe_allow_html=True
-                    )
-    
-    # Export to CSV option
-    csv_data = export_connections_to_csv(current_username)
-    st.download_button(
-        label="Download CSV",
-        data=csv_data,
-        file_name=f"github_data_{current_username}.csv",
-        mime="text/csv"
-    )
-
-def show_not_following_back_tab(connections_data):
-    not_following_back = [row for row in connections_data if row['following'] == 'Yes' and row['follower'] == 'No']
+        render_profile_cards(current_username, key="overview_cards")
     
+    # Exports are generated on request and streamed from the database
+    show_export_section(current_username)
+
+def show_not_following_back_tab(current_username):
     st.write("### Users Not Following Back")
     
-    # Display profile cards in a grid
-    cols = st.columns(3)
-    for idx, user in enumerate(not_following_back):
-        with cols[idx % 3]:
-            with st.container():
-                st.markdown(
-                    f"""
-                    <div style="padding: 1rem; border: 1px solid #ddd; border-radius: 8px; margin-bottom: 1rem; background-color: #FFCCCC;">
-                        <div style="display: flex; align-items: center; margin-bottom: 10px">
-                            <img src="{user['avatar_url']}" style="width: 60px; height: 60px; border-radius: 50%; margin-right: 10px">
-                            <div>
-                                <h3 style="margin: 0">{user['username']}</h3>
-                                <p style="margin: 0; color: #666">{user['name'] or ''}</p>
-                            </div>
-                        </div>
-                        <p style="margin: 5px 0">{user['bio'] or ''}</p>
-                        <p style="margin: 5px 0">📍 {user['location'] or 'No location'}</p>
-                        <p style="margin: 5px 0">📚 {user['public_repos']} public repos</p>
-                        <p style="margin: 5px 0">Status: Following but not following back</p>
-                        <a href="{user['link']}" target="_blank">View Profile</a>
-                    </div>
-                    """,
-                    unsafe_allow_html=True
-                )
+    render_profile_cards(current_username, key="not_following_back_cards", status='not_following_back',
+                         status_text="Following but not following back")
 
-def show_visualizations_tab(connections_data):
+def show_visualizations_tab(metrics):
     st.write("## GitHub Network Analytics")
     
-    # Calculate core metrics
-    following_count = sum(1 for row in connections_data if row['following'] == 'Yes')
-    followers_count = sum(1 for row in connections_data if row['follower'] == 'Yes')
-    mutual_followers = sum(1 for row in connections_data if row['following'] == 'Yes' and row['follower'] == 'Yes')
-    
     # Network Health Metrics - Simple key metrics
     st.write("### 📊 Network Overview")
     col1, col2, col3 = st.columns(3)
     with col1:
-        network_size = len(connections_data)
-        st.metric("Network Size", network_size,
+        st.metric("Network Size", metrics.network_size,
                  help="Total number of unique connections")
     with col2:
-        influence_ratio = (followers_count / following_count) if following_count > 0 else 0
-        st.metric("Influence Ratio", f"{influence_ratio:.2f}",
+        st.metric("Influence Ratio", f"{metrics.influence_ratio:.2f}",
                  help="Ratio of followers to following (>1 indicates high influence)")
     with col3:
-        engagement_rate = (mutual_followers / following_count * 100) if following_count > 0 else 0
-        st.metric("Engagement Rate", f"{engagement_rate:.1f}%", 
+        st.metric("Engagement Rate", f"{metrics.engagement_rate:.1f}%", 
                  help="Percentage of mutual connections among people you follow")
 
     # Network Composition - Simple pie chart
     st.write("### 🔄 Network Composition")
     
-    mutual = sum(1 for row in connections_data if row['following'] == 'Yes' and row['follower'] == 'Yes')
-    only_following = sum(1 for row in connections_data if row['following'] == 'Yes' and row['follower'] == 'No')
-    only_followers = sum(1 for row in connections_data if row['following'] == 'No' and row['follower'] == 'Yes')
-    
     network_fig = px.pie(
         names=['Mutual Connections', 'Only Following', 'Only Followers'],
-        values=[mutual, only_following, only_followers],
+        values=[metrics.mutual_count, metrics.only_following_count, metrics.only_followers_count],
         color_discrete_sequence=['#4CAF50', '#FFC107', '#2196F3'],
         hole=0.4
     )
@@ -350,47 +256,28 @@ def show_visualizations_tab(connections_data):
     # Top Users You Follow But Don't Follow Back - Simple bar chart
     st.write("### 👥 Top Users You Follow (Not Following Back)")
     
-    # Get users you follow but don't follow you back
-    not_following_back = [row for row in connections_data if row['following'] == 'Yes' and row['follower'] == 'No']
-    
-    # Sort by public repos count instead of followers (since we have this data)
-    if not_following_back:
-        # Sort by public repos count to show most active first
-        top_not_following = sorted(not_following_back, 
-                                 key=lambda x: int(x.get('public_repos', 0)), 
-                                 reverse=True)[:10]  # Top 10
-        
-        if top_not_following:
-            usernames = [row.get('username', 'Unknown') for row in top_not_following]
-            repo_counts = [int(row.get('public_repos', 0)) for row in top_not_following]
-            
-            fig = px.bar(
-                x=usernames,
-                y=repo_counts,
-                labels={'x': 'Username', 'y': 'Public Repositories'},
-                title="Top Users You Follow But Don't Follow You Back (by public repos)",
-                color_discrete_sequence=['#FF5722']
-            )
-            fig.update_layout(xaxis_tickangle=-45)
-            st.plotly_chart(fig, use_container_width=True)
+    # Ranked by public repos count to show most active first
+    top_not_following = metrics.top_not_following_back
+    if not top_not_following.empty:
+        fig = px.bar(
+            x=top_not_following['username'],
+            y=top_not_following['public_repos'],
+            labels={'x': 'Username', 'y': 'Public Repositories'},
+            title="Top Users You Follow But Don't Follow You Back (by public repos)",
+            color_discrete_sequence=['#FF5722']
+        )
+        fig.update_layout(xaxis_tickangle=-45)
+        st.plotly_chart(fig, use_container_width=True)
     
     # Location Map - Simple visualization of follower locations
     st.write("### 🌍 Where Your Network Is Located")
     
-    # Count locations
-    location_data = {}
-    for row in connections_data:
-        if row.get('location'):
-            location_data[row['location']] = location_data.get(row['location'], 0) + 1
-    
-    if location_data:
-        # Sort by count and get top locations
-        location_items = sorted(location_data.items(), key=lambda x: x[1], reverse=True)[:8]
-        locations, counts = zip(*location_items) if location_items else ([], [])
+    if not metrics.location_counts.empty:
+        top_locations = metrics.location_counts.head(8)
         
         fig_loc = px.bar(
-            x=locations, 
-            y=counts,
+            x=top_locations.index, 
+            y=top_locations.values,
             labels={'x': 'Location', 'y': 'Number of Connections'},
             title="Top Locations in Your Network",
             color_discrete_sequence=['#3F51B5']
@@ -401,38 +288,75 @@ def show_visualizations_tab(connections_data):
     # Simple table of follow-back opportunities
     st.write("### 🌟 Follow-Back Opportunities")
     
-    # Get active users who follow you but you don't follow back
-    follow_back_opportunities = [row for row in connections_data 
-                                if row['following'] == 'No' and row['follower'] == 'Yes']
-    
-    # Sort by repository count to show most active first
-    if follow_back_opportunities:
-        top_opportunities = sorted(follow_back_opportunities, 
-                                  key=lambda x: int(x.get('public_repos', 0)), 
-                                  reverse=True)[:5]  # Top 5
-        
-        if top_opportunities:
-            opportunity_data = [{
-                "Username": row.get('username', 'Unknown'),
-                "Public Repos": row.get('public_repos', '0'),
-                "Location": row.get('location', 'Unknown')
-            } for row in top_opportunities]
-            
-            st.table(pd.DataFrame(opportunity_data))
+    # Active users who follow you but you don't follow back, most repos first
+    top_opportunities = metrics.top_follow_back_opportunities
+    if not top_opportunities.empty:
+        st.table(top_opportunities[['username', 'public_repos', 'location']].rename(columns={
+            'username': "Username",
+            'public_repos': "Public Repos",
+            'location': "Location"
+        }).reset_index(drop=True))
     
     # Export button
     st.download_button(
         label="Download Network Summary",
-        data=pd.DataFrame({
-            "Metric": ["Network Size", "Following", "Followers", "Mutual", "Influence Ratio"],
-            "Value": [network_size, following_count, followers_count, mutual_followers, f"{influence_ratio:.2f}"]
-        }).to_csv(index=False),
+        data=metrics.summary().to_csv(index=False),
         file_name="github_network_summary.csv",
         mime="text/csv"
     )
 
-def show_history_tab():
+def show_network_timeline(current_username):
+    """Growth chart and point-in-time comparison for one user, built from the event log"""
+    st.write(f"### Network Over Time for {current_username}")
+    
+    growth = get_network_growth(current_username)
+    if growth.empty:
+        st.info("No snapshots recorded yet for this user.")
+        return
+    
+    fig_growth = px.line(
+        growth,
+        x='occurred_at',
+        y=['followers', 'following'],
+        markers=True,
+        labels={'occurred_at': 'Refresh', 'value': 'Count', 'variable': ''},
+        title="Followers and Following Over Time"
+    )
+    st.plotly_chart(fig_growth, use_container_width=True)
+    
+    first_snapshot = growth['occurred_at'].iloc[0].date()
+    as_of_date = st.date_input(
+        "Compare the current network with:",
+        value=first_snapshot,
+        min_value=first_snapshot,
+        max_value=datetime.now().date(),
+        key="as_of_date"
+    )
+    past = get_connections_as_of(current_username, datetime.combine(as_of_date, datetime.max.time()).isoformat())
+    present = get_connections_as_of(current_username, datetime.now().isoformat())
+    
+    col1, col2 = st.columns(2)
+    with col1:
+        st.metric("Followers", len(present['followers']),
+                  delta=len(present['followers']) - len(past['followers']))
+    with col2:
+        st.metric("Following", len(present['following']),
+                  delta=len(present['following']) - len(past['following']))
+    
+    col1, col2 = st.columns(2)
+    with col1:
+        st.write(f"**New followers since {as_of_date}**")
+        st.dataframe(pd.DataFrame(sorted(present['followers'] - past['followers']), columns=["Username"]),
+                     use_container_width=True)
+    with col2:
+        st.write(f"**Lost followers since {as_of_date}**")
+        st.dataframe(pd.DataFrame(sorted(past['followers'] - present['followers']), columns=["Username"]),
+                     use_container_width=True)
+
+def show_history_tab(current_username):
     """Display historical analysis data"""
+    show_network_timeline(current_username)
+    
     st.write("### Analysis History")
     
     # Get list of analyzed users with timestamps
@@ -442,72 +366,271 @@ def show_history_tab():
         st.info("No analysis history available.")
         return
     
-    # Create a dataframe for display
-    history_df = pd.DataFrame(users, columns=["Username", "Last Updated"])
-    # Format the timestamp
-    history_df["Last Updated"] = pd.to_datetime(history_df["Last Updated"]).dt.strftime("%Y-%m-%d %H:%M:%S")
-    
-    st.dataframe(history_df, use_container_width=True)
+    # Every account's stored counts, with the change since its previous refresh
+    overview = get_account_overview()
+    history_df = pd.DataFrame({
+        "Username": overview["username"],
+        "Last Updated": pd.to_datetime(overview["last_updated"]).dt.strftime("%Y-%m-%d %H:%M:%S"),
+        "Followers": overview["followers_count"],
+        "Followers Change": overview["followers_change"].astype("Int64"),
+        "Following": overview["following_count"],
+        "Following Change": overview["following_change"].astype("Int64"),
+        "Mutual": overview["mutual_count"],
+        "Influence Ratio": overview["influence_ratio"].round(2),
+    })
+    
+    st.dataframe(history_df, use_container_width=True, hide_index=True)
     
     # Allow comparison between analyses
     if len(users) >= 2:
-        st.write("### Compare Network Changes")
+        st.write("### Compare Networks")
         
-        col1, col2 = st.columns(2)
+        col1, col2 = st.columns([3, 1])
         with col1:
-            user1 = st.selectbox("Select first user", [u[0] for u in users], key="user1")
+            selected = st.multiselect("Accounts to compare", [u[0] for u in users],
+                                      default=[u[0] for u in users[:2]], key="compare_users")
         with col2:
-            user2 = st.selectbox("Select second user", [u[0] for u in users], key="user2", index=1 if len(users) > 1 else 0)
+            relation = st.selectbox("Compare", list(RELATIONS), format_func=RELATIONS.get, key="compare_relation")
         
-        if st.button("Compare Networks") and user1 != user2:
-            # Get connections for both users
-            connections1 = get_user_connections(user1)
-            connections2 = get_user_connections(user2)
-            
-            # Calculate metrics
-            following1 = sum(1 for row in connections1 if row['following'] == 'Yes')
-            followers1 = sum(1 for row in connections1 if row['follower'] == 'Yes')
-            mutual1 = sum(1 for row in connections1 if row['following'] == 'Yes' and row['follower'] == 'Yes')
-            
-            following2 = sum(1 for row in connections2 if row['following'] == 'Yes')
-            followers2 = sum(1 for row in connections2 if row['follower'] == 'Yes')
-            mutual2 = sum(1 for row in connections2 if row['following'] == 'Yes' and row['follower'] == 'Yes')
-            
-            # Display comparison
-            comparison_data = {
-                "Metric": ["Following", "Followers", "Mutual Connections", "Network Size"],
-                user1: [following1, followers1, mutual1, len(connections1)],
-                user2: [following2, followers2, mutual2, len(connections2)],
-                "Difference": [
-                    following2 - following1,
-                    followers2 - followers1,
-                    mutual2 - mutual1,
-                    len(connections2) - len(connections1)
-                ]
-            }
-            
-            comparison_df = pd.DataFrame(comparison_data)
-            st.table(comparison_df)
-            
-            # Visualization of differences
-            fig_comp = plt.figure(figsize=(10, 6))
-            x = ["Following", "Followers", "Mutual", "Network Size"]
-            width = 0.35
-            
-            plt.bar([i - width/2 for i in range(len(x))], 
-                    [following1, followers1, mutual1, len(connections1)], 
-                    width, label=user1)
-            plt.bar([i + width/2 for i in range(len(x))], 
-                    [following2, followers2, mutual2, len(connections2)], 
-                    width, label=user2)
-            
-            plt.xlabel('Metrics')
-            plt.ylabel('Count')
-            plt.title('Network Comparison')
-            plt.xticks(range(len(x)), x)
-            plt.legend()
-            
-            st.pyplot(fig_comp)
+        if len(selected) >= 2:
+            show_network_comparison(selected, relation)
+        else:
+            st.info("Select at least two accounts to compare.")
+
+def show_network_comparison(usernames, relation):
+    """Counts side by side plus overlap, union, difference and similarity of the accounts' sets"""
+    # Stored summaries of every account
+    all_metrics = [load_metrics(username) for username in usernames]
+    labels = ["Following", "Followers", "Mutual Connections", "Network Size"]
+    comparison_df = pd.DataFrame({"Metric": labels})
+    for username, metrics in zip(usernames, all_metrics):
+        comparison_df[username] = [metrics.following_count, metrics.followers_count, metrics.mutual_count,
+                                   metrics.network_size]
+    st.table(comparison_df)
+    
+    # Visualization of the counts
+    fig_comp = plt.figure(figsize=(10, 6))
+    x = ["Following", "Followers", "Mutual", "Network Size"]
+    width = 0.8 / len(usernames)
+    
+    for i, username in enumerate(usernames):
+        offset = (i - (len(usernames) - 1) / 2) * width
+        plt.bar([j + offset for j in range(len(x))], comparison_df[username], width, label=username)
+    
+    plt.xlabel('Metrics')
+    plt.ylabel('Count')
+    plt.title('Network Comparison')
+    plt.xticks(range(len(x)), x)
+    plt.legend()
+    
+    st.pyplot(fig_comp)
+    
+    # Set algebra on the accounts' GitHub id sets
+    comparison = SetComparison.load(usernames, relation)
+    label = RELATIONS[relation].lower()
+    
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        st.metric(f"Shared by all ({label})", len(comparison.intersection()))
+    with col2:
+        st.metric(f"Combined ({label})", len(comparison.union()))
+    with col3:
+        if len(usernames) == 2:
+            st.metric("Jaccard Similarity", f"{comparison.jaccard(*usernames):.3f}")
+    
+    summary = comparison.summary()
+    summary.columns = ["Username", "Size", "Only This Account", "Shared By All"]
+    st.dataframe(summary, use_container_width=True, hide_index=True)
+    
+    if len(usernames) > 2:
+        fig_similarity = px.imshow(comparison.jaccard_matrix(), text_auto='.2f', zmin=0, zmax=1,
+                                   color_continuous_scale='Blues', title=f"Jaccard similarity of {label}")
+        st.plotly_chart(fig_similarity, use_container_width=True)
+    
+    # Difference: who is in one account's set but in none of the others
+    col1, col2 = st.columns(2)
+    with col1:
+        owner = st.selectbox("Only in the network of", usernames, key="difference_owner")
+    with col2:
+        others = st.multiselect("and not in", [u for u in usernames if u != owner],
+                                default=[u for u in usernames if u != owner], key=f"difference_others_{owner}")
+    difference = comparison.difference(owner, others)
+    # Long differences are cut off; the count is always complete
+    logins = get_logins(difference[:500])
+    st.write(f"**{len(difference)} {label} of {owner} not in {', '.join(others) or 'any other account'}**")
+    st.dataframe(pd.DataFrame(logins, columns=["Username"]), use_container_width=True, hide_index=True)
+
+@st.cache_data(max_entries=4)
+def compute_graph_analytics(root, crawl_status):
+    """PageRank, communities and suggestions for a crawl
+    
+    crawl_status is part of the cache key, so the analytics refresh as the crawl grows.
+    """
+    edges = get_crawl_edges(root)
+    graph = FollowGraph.from_edges(edges)
+    return len(edges), graph.summary(top=None), graph.suggestions(root)
+
+def show_graph_tab(current_username, token, max_workers):
+    """Crawl the extended network and display graph analytics"""
+    st.write("### Extended Network")
+    st.caption("Expands the followers and following of your connections breadth-first. "
+               f"Each expanded account costs two to {2 * DEFAULT_CRAWL_MAX_PAGES} API requests, so the node "
+               f"budget caps the crawl; only the first {DEFAULT_CRAWL_MAX_PAGES * PER_PAGE} followers and "
+               "following of popular accounts are read.")
+    
+    col1, col2 = st.columns(2)
+    with col1:
+        depth = st.slider("Crawl depth", min_value=1, max_value=3, value=DEFAULT_CRAWL_DEPTH,
+                          help="Hops away from you; depth 1 covers your own connections and depth 2 "
+                               "reaches the connections of your connections")
+    with col2:
+        node_budget = st.number_input("Node budget", min_value=1, value=DEFAULT_CRAWL_NODE_BUDGET, step=50,
+                                      help="Maximum number of accounts to expand in total")
+    
+    col1, col2 = st.columns(2)
+    with col1:
+        if st.button("Crawl Network"):
+            progress_bar = st.progress(0)
+            try:
+                crawl_network(current_username, token, RequestScheduler(pool_size=max_workers), depth,
+                              node_budget, max_workers,
+                              progress_callback=lambda done, total: progress_bar.progress(min(done / total, 1.0)))
+            except RateLimitExceeded as e:
+                st.warning(f"{e}. The crawl has been saved; click Crawl Network again after the reset to resume.")
+            except requests.RequestException as e:
+                st.error(f"Network error while contacting GitHub: {e}. The crawl has been saved.")
+            finally:
+                progress_bar.empty()
+    with col2:
+        if st.button("Restart Crawl", help="Forget the crawl frontier and start again from your account"):
+            reset_crawl(current_username)
+    
+    status = get_crawl_status(current_username)
+    col1, col2, col3 = st.columns(3)
+    col1.metric("Expanded", status['expanded'])
+    col2.metric("Pending", status['pending'])
+    col3.metric("Failed", status['failed'])
+    
+    if not status['expanded']:
+        st.info("No crawl data yet. Click Crawl Network to explore beyond your direct connections.")
+        return
+    
+    edge_count, summary, suggestions = compute_graph_analytics(current_username, tuple(status.values()))
+    
+    col1, col2, col3 = st.columns(3)
+    col1.metric("Accounts", len(summary))
+    col2.metric("Follow Edges", edge_count)
+    col3.metric("Communities", summary['community'].nunique())
+    
+    st.write("#### Most Influential Accounts (PageRank)")
+    st.dataframe(summary.head(20), use_container_width=True, hide_index=True)
+    
+    st.write("#### Largest Communities")
+    community_sizes = summary['community'].value_counts().head(10).reset_index()
+    community_sizes.columns = ['Community', 'Members']
+    community_sizes['Community'] = community_sizes['Community'].astype(str)
+    st.plotly_chart(px.bar(community_sizes, x='Community', y='Members'), use_container_width=True)
+    
+    st.write("#### Suggested Accounts to Follow")
+    if suggestions.empty:
+        st.info("No suggestions yet. Try a deeper crawl.")
+    else:
+        st.dataframe(suggestions, use_container_width=True, hide_index=True)
+
+def show_run_summary(title, run):
+    """Headline numbers and slowest spans of one perf run record"""
+    st.write(f"**{title}**: {run['seconds']:.2f}s")
+    hit_rate = run['http_cache_hit_rate']
+    st.caption(f"{run['http_requests']} HTTP requests, {run['http_bytes'] / 1024:.0f} KB, "
+               f"{run['quota_used']} quota used, "
+               f"HTTP cache hit rate {'n/a' if hit_rate is None else f'{hit_rate:.0%}'}")
+    if run['spans']:
+        spans = pd.DataFrame([
+            {'Span': name, 'Calls': span['count'], 'Seconds': round(span['seconds'], 3)}
+            for name, span in run['spans'].items()
+        ]).sort_values('Seconds', ascending=False)
+        st.dataframe(spans, use_container_width=True, hide_index=True)
+
+def show_performance_panel(render_run, current_username, token=None):
+    """Sidebar breakdown of where the last refresh and this page render spent their time"""
+    st.markdown("---")
+    st.header("Performance")
+    quotas = token.status() if token else []
+    if quotas:
+        st.write("**Token quotas**")
+        st.dataframe(pd.DataFrame(quotas), use_container_width=True, hide_index=True)
+    last_refresh = get_latest_perf_run(current_username) if current_username else None
+    if last_refresh:
+        show_run_summary("Last refresh", last_refresh)
+    if render_run:
+        show_run_summary("This render", render_run)
+    if current_username:
+        history = get_perf_runs(current_username)
+        if not history.empty:
+            st.write("**Recent refreshes**")
+            st.dataframe(history, use_container_width=True, hide_index=True)
+
+# Seconds between progress checks while a refresh job is queued or running
+JOB_POLL_SECONDS = 2
+
+def show_job_status(jobs):
+    """Progress or outcome of this session's refresh jobs"""
+    for job in jobs:
+        if job['status'] in ACTIVE_JOB_STATUSES:
+            total = job['progress_total']
+            if job['status'] == 'queued':
+                text = f"{job['username']}: queued"
+            elif total:
+                text = f"{job['username']}: {job['progress_done']}/{total} profiles"
+            else:
+                text = f"{job['username']}: fetching connections"
+            st.progress(job['progress_done'] / total if total else 0, text=text)
+            if job['message']:
+                st.caption(job['message'])
+            if job['status'] == 'queued' and st.button("Cancel", key=f"cancel_job_{job['id']}"):
+                cancel_job(job['id'])
+        elif job['status'] == 'done':
+            st.success(f"Data saved for {job['username']}: {job['message']}")
+        elif job['status'] == 'failed':
+            st.error(f"Refresh of {job['username']} failed: {job['message']}")
+
+@st.fragment(run_every=JOB_POLL_SECONDS)
+def poll_refresh_jobs():
+    """Re-render job progress every few seconds and rerun the app once a job finishes"""
+    watched = st.session_state.watched_jobs
+    jobs = get_jobs(list(watched))
+    show_job_status(jobs)
+    # Once everything has settled, rerun the whole app so the main area shows the new data
+    if not any(job['status'] in ACTIVE_JOB_STATUSES for job in jobs):
+        st.rerun()
+
+def show_refresh_jobs():
+    """Job progress in the sidebar, polling only while something is still queued or running"""
+    watched = st.session_state.get('watched_jobs')
+    if not watched:
+        return
+    jobs = get_jobs(list(watched))
+    if any(job['status'] in ACTIVE_JOB_STATUSES for job in jobs):
+        poll_refresh_jobs()
+        return
+    show_job_status(jobs[:3])
+    # Open the refreshed account if nothing else is on screen yet
+    done = [job for job in jobs if job['status'] == 'done']
+    if done and 'current_user' not in st.session_state:
+        st.session_state.current_user = done[0]['username']
+
+def show_auto_refresh(current_username, token):
+    """Sidebar control for the scheduled refresh of the open account"""
+    interval = get_schedule(current_username) or 0
+    with st.expander(f"Auto-refresh {current_username}"):
+        hours = st.number_input("Refresh every (hours, 0 = off)", min_value=0.0, value=float(interval),
+                                step=1.0, key=f"auto_refresh_{current_username}")
+        st.caption("Runs in the background worker. Tokens entered above are kept in memory "
+                   "for scheduled refreshes until the app restarts.")
+        if st.button("Save Schedule", key=f"save_schedule_{current_username}"):
+            set_schedule(current_username, hours)
+            get_refresh_worker().remember_token(current_username, token)
+            st.success("Auto-refresh turned off" if not hours else f"Refreshing every {hours:g} hours")
 
 # Streamlit App
 st.set_page_config(layout="wide", page_title="GitHub Followers Analyzer", page_icon="📊")
@@ -515,6 +638,9 @@ st.title("GitHub Followers Analyzer")
 
 # Initialize database if it doesn't exist
 initialize_database()
+# Refreshes run on this process-wide worker thread, independent of any browser session; jobs
+# submitted with a token typed in here are only run by it, since no other process knows the token
+worker = get_refresh_worker()
 
 # Sidebar controls
 with st.sidebar:
@@ -536,22 +662,47 @@ with st.sidebar:
     
     st.header("Analyze New Profile")
     username = st.text_input("Enter GitHub Username:")
-    token = st.text_input("Enter GitHub Token (optional):", type="password", 
-                          help="Using a token allows for higher API rate limits")
+    token_text = st.text_input("Enter GitHub Token(s) (optional):", type="password",
+                               help="Using a token allows for higher API rate limits. Separate several tokens "
+                                    "with commas: each request goes to the one with the most quota left.")
+    tokens = parse_tokens(token_text)
+    # Shared with the background worker, which keeps learning each token's remaining quota
+    token = get_token_pool(tokens) if tokens else None
+    if len(tokens) > 1:
+        st.caption(f"{len(tokens)} tokens pooled")
+    max_workers = st.slider("Concurrent profile requests", min_value=1, max_value=64,
+                            value=DEFAULT_MAX_WORKERS,
+                            help="Number of profile lookups sent to GitHub in parallel")
+    use_graphql = st.checkbox("Batch profile lookups (GraphQL)", value=True,
+                              help="Fetch up to 100 profiles per request. Requires a token; "
+                                   "falls back to one REST call per user if a batch fails")
+    incremental = st.checkbox("Incremental refresh", value=True,
+                              help="Only refetch profiles older than the TTL and only write connections that changed")
+    profile_ttl_hours = st.number_input("Profile TTL (hours)", min_value=0, value=DEFAULT_PROFILE_TTL_HOURS,
+                                        disabled=not incremental)
+    full_refresh_hours = st.number_input("Full re-pagination after (hours)", min_value=0,
+                                         value=DEFAULT_FULL_REFRESH_HOURS, disabled=not incremental,
+                                         help="Until then, accounts whose follower/following counts haven't "
+                                              "changed are checked with a single request. 0 always paginates.")
+    cache_avatars = st.checkbox("Cache avatar thumbnails", value=True,
+                                help="Download small avatars once and serve cards from the local cache")
+    show_performance = st.checkbox("Show performance panel", value=False,
+                                   help="Time spans, HTTP traffic and cache hit rates of refreshes and renders")
     
     if st.button("Fetch Data"):
         if username:
-            with st.spinner('Fetching data from GitHub...'):
-                data = get_github_data(username, token)
-                if data:
-                    success = save_to_database(data, username, token)
-                    if success:
-                        st.success(f"Data saved for {username}")
-                        st.session_state.current_user = username
-                else:
-                    st.error("Failed to fetch data from GitHub API. Try using a token to get more requests.")
+            # The refresh runs in the background; stored data stays on screen meanwhile
+            job_id = worker.submit(username, token, max_workers=max_workers, use_graphql=use_graphql,
+                                   incremental=incremental, profile_ttl_hours=profile_ttl_hours,
+                                   cache_avatars=cache_avatars, full_refresh_hours=full_refresh_hours)
+            st.session_state.setdefault('watched_jobs', set()).add(job_id)
         else:
             st.warning("Please enter a username.")
+    
+    show_refresh_jobs()
+    
+    if 'current_user' in st.session_state:
+        show_auto_refresh(st.session_state.current_user, token)
 
     # Add color code legend to sidebar
     st.markdown("---")
@@ -574,22 +725,34 @@ with st.sidebar:
     """, unsafe_allow_html=True)
 
 # Main content area with tabs
+render_run = None
 if 'current_user' in st.session_state:
     current_username = st.session_state.current_user
-    connections_data = get_user_connections(current_username)
-    
-    st.write(f"### Analysis Results for {current_username}")
-    
-    tab1, tab2, tab3, tab4 = st.tabs(["Overview", "Not Following Back", "Visualizations", "History"])
-    
-    with tab1:
-        show_overview_tab(connections_data, current_username)
-    
-    with tab2:
-        show_not_following_back_tab(connections_data)
-    
-    with tab3:
-        show_visualizations_tab(connections_data)
-    
-    with tab4:
-        show_history_tab()
\ No newline at end of file
+    # Renders are only stored while the performance panel is open
+    with perf_run('render', current_username, on_finish=record_perf_run if show_performance else None) as render_run:
+        # Read once per run from the stored summary and shared by every tab
+        metrics = load_metrics(current_username)
+        
+        st.write(f"### Analysis Results for {current_username}")
+        
+        tab1, tab2, tab3, tab4, tab5 = st.tabs(["Overview", "Not Following Back", "Visualizations", "History",
+                                                "Network Graph"])
+        
+        with tab1, perf.span('tab.overview'):
+            show_overview_tab(metrics, current_username)
+        
+        with tab2, perf.span('tab.not_following_back'):
+            show_not_following_back_tab(current_username)
+        
+        with tab3, perf.span('tab.visualizations'):
+            show_visualizations_tab(metrics)
+        
+        with tab4, perf.span('tab.history'):
+            show_history_tab(current_username)
+        
+        with tab5, perf.span('tab.network_graph'):
+            show_graph_tab(current_username, token, max_workers)
+
+if show_performance:
+    with st.sidebar:
+        show_performance_panel(render_run, st.session_state.get('current_user'), token)
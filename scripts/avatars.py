@@ -0,0 +1,134 @@
+"""Content-addressed on-disk cache of small avatar thumbnails"""
+import base64
+import hashlib
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+import requests
+
+from instrumentation import perf
+
+AVATAR_CACHE_DIR = 'data/avatars'
+
+# Cards show avatars at 60px; 96px keeps them sharp on high-DPI screens
+AVATAR_SIZE = 96
+
+# Total size of stored thumbnails before least recently used ones are evicted
+AVATAR_CACHE_MAX_BYTES = 50 * 1024 * 1024
+
+# Magic numbers of the formats GitHub serves avatars in
+IMAGE_SIGNATURES = [
+    (b'\x89PNG', 'image/png'),
+    (b'\xff\xd8\xff', 'image/jpeg'),
+    (b'GIF8', 'image/gif'),
+    (b'RIFF', 'image/webp'),
+]
+
+def thumbnail_url(avatar_url, size=AVATAR_SIZE):
+    """Ask GitHub's avatar service to resize server-side, so only the thumbnail is downloaded"""
+    parts = urlsplit(avatar_url)
+    query = dict(parse_qsl(parts.query))
+    query['s'] = str(size)
+    return urlunsplit(parts._replace(query=urlencode(query)))
+
+def avatar_key(avatar_url):
+    """Cache key from the avatar's path and version parameter (v changes when the user uploads a new one)"""
+    parts = urlsplit(avatar_url)
+    version = dict(parse_qsl(parts.query)).get('v', '')
+    return hashlib.sha256(f"{parts.netloc}{parts.path}?v={version}".encode()).hexdigest()
+
+class AvatarCache:
+    """Thumbnails stored as data/avatars/<sha256>, evicted least recently used first"""
+    def __init__(self, directory=AVATAR_CACHE_DIR, max_bytes=AVATAR_CACHE_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+        self.total_bytes = sum(entry.stat().st_size for entry in os.scandir(directory) if entry.is_file())
+
+    def path(self, avatar_url):
+        return os.path.join(self.directory, avatar_key(avatar_url))
+
+    def has(self, avatar_url):
+        return os.path.exists(self.path(avatar_url))
+
+    def read(self, avatar_url):
+        """Return the cached thumbnail bytes, or None, marking the entry as recently used"""
+        path = self.path(avatar_url)
+        try:
+            with open(path, 'rb') as f:
+                data = f.read()
+        except FileNotFoundError:
+            return None
+        # mtime doubles as the LRU timestamp; atime is unreliable on noatime mounts
+        os.utime(path)
+        return data
+
+    def data_uri(self, avatar_url):
+        """Inline data: URI for a cached thumbnail, falling back to the remote URL"""
+        data = self.read(avatar_url) if avatar_url else None
+        perf.count('avatar_cache.hits' if data else 'avatar_cache.misses')
+        if not data:
+            return avatar_url
+        mime = next((mime for signature, mime in IMAGE_SIGNATURES if data.startswith(signature)), 'image/png')
+        return f"data:{mime};base64,{base64.b64encode(data).decode()}"
+
+    def store(self, avatar_url, data):
+        path = self.path(avatar_url)
+        # Write to a temp file first so readers never see a partial image
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        with self.lock:
+            old_size = os.path.getsize(path) if os.path.exists(path) else 0
+            os.replace(tmp_path, path)
+            self.total_bytes += len(data) - old_size
+            if self.total_bytes > self.max_bytes:
+                self._evict()
+
+    def _evict(self):
+        """Delete the least recently used thumbnails until back under 90% of the budget"""
+        entries = sorted(
+            (entry for entry in os.scandir(self.directory) if entry.is_file() and not entry.name.endswith('.tmp')),
+            key=lambda entry: entry.stat().st_mtime
+        )
+        target = self.max_bytes * 0.9
+        for entry in entries:
+            if self.total_bytes <= target:
+                break
+            size = entry.stat().st_size
+            try:
+                os.remove(entry.path)
+            except FileNotFoundError:
+                continue
+            self.total_bytes -= size
+
+    def fetch(self, avatar_url, session=None):
+        """Download and store one thumbnail; failures are skipped and retried on a later refresh"""
+        try:
+            response = (session or requests).get(thumbnail_url(avatar_url), timeout=30)
+        except requests.RequestException:
+            return False
+        if response.status_code != 200 or not response.content:
+            return False
+        self.store(avatar_url, response.content)
+        return True
+
+    def fetch_many(self, avatar_urls, session=None, max_workers=16):
+        """Download thumbnails that aren't cached yet, returning how many were fetched"""
+        missing = [url for url in dict.fromkeys(avatar_urls) if url and not self.has(url)]
+        if not missing:
+            return 0
+        with ThreadPoolExecutor(max_workers=max(1, int(max_workers))) as executor:
+            return sum(executor.map(lambda url: self.fetch(url, session), missing))
+
+_avatar_cache = None
+
+def get_avatar_cache():
+    """Process-wide AvatarCache, created on first use"""
+    global _avatar_cache
+    if _avatar_cache is None:
+        _avatar_cache = AvatarCache()
+    return _avatar_cache
@@ -0,0 +1,113 @@
+"""Refresh many GitHub accounts from the command line, e.g. nightly from cron
+
+    python scripts/batch_refresh.py --file org_members.txt --token "$GITHUB_TOKEN" --accounts 4
+    python scripts/batch_refresh.py --file org_members.txt --token "$TOKEN_A" --token "$TOKEN_B"
+
+All accounts share one request scheduler and token pool, so they draw from the same
+rate-limit budget, and write to the same SQLite database as the Streamlit app.
+"""
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import requests
+
+from database import DEFAULT_FULL_REFRESH_HOURS, DEFAULT_PROFILE_TTL_HOURS, initialize_database
+from github_api import DEFAULT_MAX_WORKERS, RateLimitExceeded, RequestScheduler, get_token_pool, parse_tokens
+from pipeline import refresh_account
+
+def read_usernames(args):
+    """Collect usernames from the command line and/or a file with one login per line"""
+    usernames = list(args.usernames)
+    if args.file:
+        with open(args.file) if args.file != '-' else sys.stdin as f:
+            for line in f:
+                line = line.split('#', 1)[0].strip()
+                if line:
+                    usernames.append(line)
+    # Preserve order but drop duplicates
+    return list(dict.fromkeys(usernames))
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Refresh follower data for many GitHub accounts")
+    parser.add_argument('usernames', nargs='*', help="GitHub usernames to refresh")
+    parser.add_argument('-f', '--file', help="File with one username per line ('-' for stdin)")
+    parser.add_argument('--token', dest='tokens', action='append',
+                        help="GitHub token; repeat to pool several (defaults to $GITHUB_TOKENS, "
+                             "comma-separated, or $GITHUB_TOKEN)")
+    parser.add_argument('--accounts', type=int, default=4,
+                        help="Number of accounts refreshed at the same time")
+    parser.add_argument('--max-workers', type=int, default=DEFAULT_MAX_WORKERS,
+                        help="Concurrent profile lookups per account")
+    parser.add_argument('--no-graphql', dest='use_graphql', action='store_false',
+                        help="Use one REST call per profile instead of batched GraphQL")
+    parser.add_argument('--full', dest='incremental', action='store_false',
+                        help="Refetch every profile and rewrite every connection")
+    parser.add_argument('--no-avatars', dest='cache_avatars', action='store_false',
+                        help="Don't download avatar thumbnails into the local cache")
+    parser.add_argument('--ttl', type=float, default=DEFAULT_PROFILE_TTL_HOURS,
+                        help="Profile TTL in hours for incremental refreshes")
+    parser.add_argument('--full-refresh-hours', type=float, default=DEFAULT_FULL_REFRESH_HOURS,
+                        help="Skip pagination of accounts whose follower/following counts are unchanged, "
+                             "unless their last full pass is older than this; 0 always paginates")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    usernames = read_usernames(args)
+    if not usernames:
+        print("No usernames given", file=sys.stderr)
+        return 2
+    
+    initialize_database()
+    tokens = args.tokens or parse_tokens(os.environ.get('GITHUB_TOKENS') or os.environ.get('GITHUB_TOKEN'))
+    token = get_token_pool(tokens)
+    accounts = max(1, args.accounts)
+    scheduler = RequestScheduler(pool_size=accounts * args.max_workers)
+    
+    started = time.perf_counter()
+    succeeded, failed = [], []
+    with ThreadPoolExecutor(max_workers=accounts) as executor:
+        futures = {
+            executor.submit(refresh_account, username, token, scheduler, args.max_workers,
+                            args.use_graphql, args.incremental, args.ttl,
+                            cache_avatars=args.cache_avatars, full_refresh_hours=args.full_refresh_hours): username
+            for username in usernames
+        }
+        for future in as_completed(futures):
+            username = futures[future]
+            try:
+                stats = future.result()
+            except RateLimitExceeded as e:
+                failed.append(username)
+                print(f"{username}: {e}; rerun to resume", flush=True)
+                continue
+            except requests.RequestException as e:
+                failed.append(username)
+                print(f"{username}: network error: {e}", flush=True)
+                continue
+            if not stats:
+                failed.append(username)
+                print(f"{username}: GitHub API refused the request", flush=True)
+                continue
+            succeeded.append(stats)
+            connections = stats['followers'] + stats['following']
+            print(f"{username}: {stats['followers']} followers, {stats['following']} following, "
+                  f"{stats['profiles_fetched']} profiles fetched with {stats['perf']['http_requests']} requests "
+                  f"in {stats['seconds']:.1f}s "
+                  f"({connections / max(stats['seconds'], 1e-9):.0f} connections/s, {stats['strategy']})", flush=True)
+    
+    elapsed = time.perf_counter() - started
+    total_connections = sum(s['followers'] + s['following'] for s in succeeded)
+    total_profiles = sum(s['profiles_fetched'] for s in succeeded)
+    print(f"\nRefreshed {len(succeeded)}/{len(usernames)} accounts in {elapsed:.1f}s: "
+          f"{total_connections} connections, {total_profiles} profiles "
+          f"({total_profiles / max(elapsed, 1e-9):.1f} profiles/s)")
+    if failed:
+        print(f"Failed: {', '.join(failed)}")
+    return 1 if failed else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,183 @@
+"""Breadth-first crawler that expands the follow graph beyond the analyzed user's direct connections"""
+from datetime import datetime
+
+import pandas as pd
+
+from database import apply_renames, get_db_connection, intern_logins, read_connection
+from github_api import DEFAULT_MAX_WORKERS, PER_PAGE, RequestScheduler, get_github_data
+
+DEFAULT_CRAWL_DEPTH = 2
+
+# Nodes expanded per crawl; each expansion paginates that user's followers and following
+DEFAULT_CRAWL_NODE_BUDGET = 200
+
+# Pages read from each list of an expanded node, so one popular account can't use up the quota;
+# only its first DEFAULT_CRAWL_MAX_PAGES * PER_PAGE followers and following become edges
+DEFAULT_CRAWL_MAX_PAGES = 5
+
+def get_stored_connections(cursor, username):
+    """GitHub ids of an already analyzed account's followers/following, so the crawler doesn't refetch them"""
+    cursor.execute('SELECT 1 FROM main_users WHERE username = ?', (username,))
+    if cursor.fetchone() is None:
+        return None
+    cursor.execute('''
+    SELECT related_id, is_following, is_follower FROM connections
+    WHERE main_user = ?
+    ''', (username,))
+    rows = cursor.fetchall()
+    return {
+        'followers': [user for user, _, is_follower in rows if is_follower],
+        'following': [user for user, is_following, _ in rows if is_following]
+    }
+
+def get_expanded_edges(cursor, root, node_id):
+    """Stored edges of a node another crawl already expanded, so it isn't fetched again"""
+    cursor.execute('''
+    SELECT 1 FROM crawl_frontier
+    WHERE node_id = ? AND root != ? AND status = 'done'
+    LIMIT 1
+    ''', (node_id, root))
+    if cursor.fetchone() is None:
+        return None
+    cursor.execute('SELECT follower_id FROM graph_edges WHERE followee_id = ?', (node_id,))
+    followers = [row[0] for row in cursor.fetchall()]
+    cursor.execute('SELECT followee_id FROM graph_edges WHERE follower_id = ?', (node_id,))
+    return {'followers': followers, 'following': [row[0] for row in cursor.fetchall()]}
+
+def crawl_network(root, token=None, scheduler=None, max_depth=DEFAULT_CRAWL_DEPTH,
+                  max_nodes=DEFAULT_CRAWL_NODE_BUDGET, max_workers=DEFAULT_MAX_WORKERS, progress_callback=None,
+                  max_pages=DEFAULT_CRAWL_MAX_PAGES):
+    """Expand the follow graph around root breadth-first, up to max_depth hops and max_nodes expansions
+    
+    Only nodes less than max_depth hops from root are expanded, so depth 1 stores root's
+    own edges and depth 2 reaches the connections of its connections. Accounts that
+    aren't stored cost at most max_pages requests per list to expand. Nodes and edges
+    are stored by GitHub id, so an account is one node whatever login it was reached by,
+    and a node already expanded by another crawl is expanded from its stored edges.
+    The frontier lives in crawl_frontier and every expansion is committed on its own,
+    so calling this again after an interruption (or with a bigger budget) continues the crawl.
+    Returns {'expanded': ..., 'pending': ..., 'failed': ...} counts for this root.
+    """
+    scheduler = scheduler or RequestScheduler(pool_size=max_workers)
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    
+    with conn:
+        cursor.execute('''
+        INSERT OR IGNORE INTO crawl_frontier (root, node_id, depth, status)
+        VALUES (?, ?, 0, 'pending')
+        ''', (root, intern_logins(cursor, [root])[root]))
+    
+    cursor.execute("SELECT COUNT(*) FROM crawl_frontier WHERE root = ? AND status = 'done'", (root,))
+    expanded = cursor.fetchone()[0]
+    
+    try:
+        while expanded < max_nodes:
+            cursor.execute('''
+            SELECT u.username, f.node_id, f.depth FROM crawl_frontier f
+            JOIN github_users u ON u.github_id = f.node_id
+            WHERE f.root = ? AND f.status = 'pending' AND f.depth < ?
+            ORDER BY f.depth, f.rowid
+            LIMIT 1
+            ''', (root, max_depth))
+            row = cursor.fetchone()
+            if row is None:
+                break
+            username, node_id, depth = row
+            
+            # Accounts analyzed through the app are expanded from the database, and so are
+            # nodes whose edges another crawl already collected
+            data = get_stored_connections(cursor, username)
+            complete = {'followers': True, 'following': True}
+            if data is None:
+                data = get_expanded_edges(cursor, root, node_id)
+                # The stored edges are left as they are
+                complete = {'followers': False, 'following': False}
+            fetched = data is None
+            if fetched:
+                data = get_github_data(username, token, scheduler, None, max_workers, max_pages)
+            
+            with conn:
+                if data is None:
+                    cursor.execute('''
+                    UPDATE crawl_frontier SET status = 'failed', expanded_at = ?
+                    WHERE root = ? AND node_id = ?
+                    ''', (datetime.now().isoformat(), root, node_id))
+                    continue
+                if fetched:
+                    # A list that filled every page it was allowed may have been cut short
+                    complete = {relation: max_pages is None or len(data[relation]) < max_pages * PER_PAGE
+                                for relation in ('followers', 'following')}
+                    # Intern the logins read from GitHub, following renames by GitHub id
+                    apply_renames(cursor, data['ids'])
+                    ids = intern_logins(cursor, data['followers'] + data['following'])
+                    data = {relation: [ids[user] for user in data[relation]] for relation in ('followers', 'following')}
+                
+                # A list read in full replaces that side of the node's edges, so unfollows since an
+                # earlier crawl disappear. Edges to analyzed accounts came from their stored
+                # connections and are kept; a truncated list only adds edges
+                for relation, column, other in (('following', 'follower_id', 'followee_id'),
+                                                ('followers', 'followee_id', 'follower_id')):
+                    if complete[relation]:
+                        cursor.execute(f'''
+                        DELETE FROM graph_edges WHERE {column} = ? AND {other} NOT IN (
+                            SELECT u.github_id FROM main_users m
+                            JOIN github_users u ON u.username = m.username
+                        )
+                        ''', (node_id,))
+                cursor.executemany('INSERT OR IGNORE INTO graph_edges (follower_id, followee_id) VALUES (?, ?)',
+                                   [(node_id, user) for user in data['following']] +
+                                   [(user, node_id) for user in data['followers']])
+                
+                # Nodes max_depth hops out are only reached by edges, never expanded
+                if depth + 1 < max_depth:
+                    cursor.executemany('''
+                    INSERT OR IGNORE INTO crawl_frontier (root, node_id, depth, status)
+                    VALUES (?, ?, ?, 'pending')
+                    ''', [(root, user, depth + 1) for user in set(data['followers']) | set(data['following'])])
+                
+                cursor.execute('''
+                UPDATE crawl_frontier SET status = 'done', expanded_at = ?
+                WHERE root = ? AND node_id = ?
+                ''', (datetime.now().isoformat(), root, node_id))
+            
+            expanded += 1
+            if progress_callback:
+                progress_callback(expanded, max_nodes)
+    finally:
+        conn.close()
+    
+    return get_crawl_status(root)
+
+def get_crawl_status(root):
+    """Frontier counts by status for a crawl root"""
+    with read_connection() as conn:
+        counts = dict(conn.execute('''
+        SELECT status, COUNT(*) FROM crawl_frontier
+        WHERE root = ?
+        GROUP BY status
+        ''', (root,)).fetchall())
+    return {
+        'expanded': counts.get('done', 0),
+        'pending': counts.get('pending', 0),
+        'failed': counts.get('failed', 0),
+    }
+
+def reset_crawl(root):
+    """Forget the frontier of a crawl so it starts again from root; collected edges are kept"""
+    conn = get_db_connection()
+    with conn:
+        conn.execute('DELETE FROM crawl_frontier WHERE root = ?', (root,))
+    conn.close()
+
+def get_crawl_edges(root):
+    """Every stored edge touching a node expanded by root's crawl, as logins"""
+    with read_connection() as conn:
+        return pd.read_sql_query('''
+        SELECT f.username AS follower, t.username AS followee
+        FROM graph_edges e
+        JOIN github_users f ON f.github_id = e.follower_id
+        JOIN github_users t ON t.github_id = e.followee_id
+        WHERE e.follower_id IN (SELECT node_id FROM crawl_frontier WHERE root = ? AND status = 'done')
+           OR e.followee_id IN (SELECT node_id FROM crawl_frontier WHERE root = ? AND status = 'done')
+        ''', conn, params=(root, root))
@@ -0,0 +1,1146 @@
+"""SQLite storage: schema, migrations, bulk write helpers and read queries"""
+import os
+import json
+import sqlite3
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+import pandas as pd
+
+from instrumentation import perf, timed
+
+DB_PATH = 'data/github_followers.db'
+
+# Profiles refreshed more recently than this are reused by incremental refreshes
+DEFAULT_PROFILE_TTL_HOURS = 24
+
+# Incremental refreshes probe the account first and skip pagination while its counts are
+# unchanged, but page through everything again once the last full pass is this old
+DEFAULT_FULL_REFRESH_HOURS = 24 * 7
+
+# Checkpoints of a refresh are only resumed this soon after they were written; older ones
+# describe lists and profiles that may have changed since, so they are dropped
+FETCH_JOB_MAX_AGE_HOURS = 6
+
+# Rows buffered in memory before each executemany during ingest
+INGEST_BATCH_SIZE = 500
+
+# Memory budget for cached get_user_connections DataFrames
+CONNECTIONS_CACHE_MAX_BYTES = 256 * 1024 * 1024
+
+def get_db_connection(db_path=DB_PATH, check_same_thread=True):
+    """Open a connection tuned for bulk ingest and concurrent reads"""
+    conn = sqlite3.connect(db_path, timeout=30, check_same_thread=check_same_thread)
+    # WAL lets readers (the UI) keep working while a refresh is writing
+    conn.execute('PRAGMA journal_mode=WAL')
+    # Safe with WAL: a crash can lose the last transaction but never corrupts the file
+    conn.execute('PRAGMA synchronous=NORMAL')
+    conn.execute('PRAGMA temp_store=MEMORY')
+    conn.execute('PRAGMA cache_size=-32000')  # ~32 MB page cache
+    return conn
+
+# Schema changes applied on top of the base tables, in order. PRAGMA user_version
+# records how many have run, so existing databases are upgraded exactly once.
+MIGRATIONS = [
+    [
+        # Serves WHERE main_user = ? plus follow-status filters without touching the table
+        '''CREATE INDEX IF NOT EXISTS idx_connections_main_user
+           ON connections(main_user, is_following, is_follower, related_user)''',
+        # Lets the TTL staleness check run off the index alone
+        '''CREATE INDEX IF NOT EXISTS idx_github_users_username_updated
+           ON github_users(username, last_updated)''',
+        '''CREATE INDEX IF NOT EXISTS idx_main_users_last_updated
+           ON main_users(last_updated)''',
+    ],
+    [
+        # Append-only log of follow/unfollow events; the state at any time T is the
+        # latest event per (related_user, relation) at or before T
+        '''CREATE TABLE IF NOT EXISTS connection_events (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            main_user TEXT,
+            related_user TEXT,
+            relation TEXT,
+            action INTEGER,
+            occurred_at TIMESTAMP
+        )''',
+        '''CREATE INDEX IF NOT EXISTS idx_connection_events_state
+           ON connection_events(main_user, related_user, relation, occurred_at, action)''',
+        '''CREATE INDEX IF NOT EXISTS idx_connection_events_time
+           ON connection_events(main_user, occurred_at)''',
+        # Seed the log with the connections we already have
+        '''INSERT INTO connection_events (main_user, related_user, relation, action, occurred_at)
+           SELECT main_user, related_user, 'following', 1, last_updated FROM connections WHERE is_following''',
+        '''INSERT INTO connection_events (main_user, related_user, relation, action, occurred_at)
+           SELECT main_user, related_user, 'follower', 1, last_updated FROM connections WHERE is_follower''',
+    ],
+    [
+        # Follow edges discovered by the network crawler (follower follows followee)
+        '''CREATE TABLE IF NOT EXISTS graph_edges (
+            follower TEXT,
+            followee TEXT,
+            PRIMARY KEY (follower, followee)
+        ) WITHOUT ROWID''',
+        '''CREATE INDEX IF NOT EXISTS idx_graph_edges_followee ON graph_edges(followee, follower)''',
+        # BFS frontier per crawl root, so an interrupted crawl resumes where it stopped
+        '''CREATE TABLE IF NOT EXISTS crawl_frontier (
+            root TEXT,
+            username TEXT,
+            depth INTEGER,
+            status TEXT,
+            expanded_at TIMESTAMP,
+            PRIMARY KEY (root, username)
+        )''',
+        '''CREATE INDEX IF NOT EXISTS idx_crawl_frontier_pending ON crawl_frontier(root, status, depth)''',
+    ],
+    [
+        # One row per instrumented refresh or render; details holds the full JSON record
+        '''CREATE TABLE IF NOT EXISTS perf_runs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            kind TEXT,
+            label TEXT,
+            status TEXT,
+            started_at TIMESTAMP,
+            seconds REAL,
+            http_requests INTEGER,
+            http_bytes INTEGER,
+            quota_used INTEGER,
+            http_cache_hit_rate REAL,
+            details TEXT
+        )''',
+        '''CREATE INDEX IF NOT EXISTS idx_perf_runs_label ON perf_runs(kind, label, started_at)''',
+    ],
+    [
+        # Refreshes run by the background worker; the UI submits rows and polls their progress
+        '''CREATE TABLE IF NOT EXISTS refresh_jobs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            username TEXT,
+            status TEXT,
+            options TEXT,
+            progress_done INTEGER DEFAULT 0,
+            progress_total INTEGER DEFAULT 0,
+            message TEXT,
+            submitted_at TIMESTAMP,
+            run_after TIMESTAMP,
+            started_at TIMESTAMP,
+            heartbeat_at TIMESTAMP,
+            finished_at TIMESTAMP
+        )''',
+        '''CREATE INDEX IF NOT EXISTS idx_refresh_jobs_queue ON refresh_jobs(status, run_after, id)''',
+        '''CREATE INDEX IF NOT EXISTS idx_refresh_jobs_username ON refresh_jobs(username, status)''',
+        # Accounts refreshed automatically every interval_hours
+        '''CREATE TABLE IF NOT EXISTS refresh_schedules (
+            username TEXT PRIMARY KEY,
+            interval_hours REAL,
+            last_enqueued_at TIMESTAMP
+        )''',
+    ],
+    [
+        # Aggregates maintained by save_to_database, so renders never scan connection rows;
+        # the top lists are JSON arrays of [username, name, public_repos, location]
+        '''CREATE TABLE IF NOT EXISTS user_summary (
+            main_user TEXT PRIMARY KEY,
+            network_size INTEGER,
+            following_count INTEGER,
+            followers_count INTEGER,
+            mutual_count INTEGER,
+            top_not_following_back TEXT,
+            top_follow_back TEXT,
+            updated_at TIMESTAMP
+        )''',
+        '''CREATE TABLE IF NOT EXISTS user_location_counts (
+            main_user TEXT,
+            location TEXT,
+            connections INTEGER,
+            PRIMARY KEY (main_user, location)
+        ) WITHOUT ROWID''',
+        # One row per refresh, for history charts and change-since-last-refresh figures
+        '''CREATE TABLE IF NOT EXISTS summary_snapshots (
+            main_user TEXT,
+            taken_at TIMESTAMP,
+            network_size INTEGER,
+            following_count INTEGER,
+            followers_count INTEGER,
+            mutual_count INTEGER,
+            PRIMARY KEY (main_user, taken_at)
+        ) WITHOUT ROWID''',
+    ],
+    [
+        # GitHub's numeric account id, which survives renames
+        '''ALTER TABLE github_users ADD COLUMN github_id INTEGER''',
+        '''CREATE UNIQUE INDEX IF NOT EXISTS idx_github_users_github_id ON github_users(github_id)''',
+    ],
+    [
+        # last_updated moves whenever the stored lists change; these record the last time
+        # both lists were paginated in full and the last probe that found nothing new
+        '''ALTER TABLE main_users ADD COLUMN last_paginated_at TIMESTAMP''',
+        '''ALTER TABLE main_users ADD COLUMN last_checked_at TIMESTAMP''',
+        '''UPDATE main_users SET last_paginated_at = last_updated, last_checked_at = last_updated''',
+    ],
+    [
+        # Full-text index over profile text; external content, so the text isn't stored twice
+        '''CREATE VIRTUAL TABLE IF NOT EXISTS github_users_fts USING fts5(
+            name, bio, location,
+            content='github_users', content_rowid='id', tokenize='unicode61 remove_diacritics 2'
+        )''',
+        # Triggers keep it in step with every write to github_users, including ingest upserts
+        '''CREATE TRIGGER IF NOT EXISTS github_users_fts_insert AFTER INSERT ON github_users BEGIN
+            INSERT INTO github_users_fts (rowid, name, bio, location)
+            VALUES (new.id, new.name, new.bio, new.location);
+        END''',
+        '''CREATE TRIGGER IF NOT EXISTS github_users_fts_delete AFTER DELETE ON github_users BEGIN
+            INSERT INTO github_users_fts (github_users_fts, rowid, name, bio, location)
+            VALUES ('delete', old.id, old.name, old.bio, old.location);
+        END''',
+        # Refreshes rewrite unchanged profiles, so only reindex rows whose text changed
+        '''CREATE TRIGGER IF NOT EXISTS github_users_fts_update AFTER UPDATE OF name, bio, location ON github_users
+        WHEN old.name IS NOT new.name OR old.bio IS NOT new.bio OR old.location IS NOT new.location BEGIN
+            INSERT INTO github_users_fts (github_users_fts, rowid, name, bio, location)
+            VALUES ('delete', old.id, old.name, old.bio, old.location);
+            INSERT INTO github_users_fts (rowid, name, bio, location)
+            VALUES (new.id, new.name, new.bio, new.location);
+        END''',
+        '''INSERT INTO github_users_fts (github_users_fts) VALUES ('rebuild')''',
+    ],
+    [
+        # Worker process that holds the token a job was submitted with; NULL lets any worker run it
+        '''ALTER TABLE refresh_jobs ADD COLUMN owner TEXT''',
+        # Liveness of every worker process, so jobs held by one that stopped can be released
+        '''CREATE TABLE IF NOT EXISTS refresh_workers (
+            id TEXT PRIMARY KEY,
+            heartbeat_at TIMESTAMP
+        )''',
+    ],
+    [
+        # rename_login looks up every stored reference to a login; without these, each
+        # rename scanned the whole event log, connection table and crawl frontier
+        '''CREATE INDEX IF NOT EXISTS idx_connection_events_related_user ON connection_events(related_user)''',
+        '''CREATE INDEX IF NOT EXISTS idx_connections_related_user ON connections(related_user)''',
+        '''CREATE INDEX IF NOT EXISTS idx_crawl_frontier_username ON crawl_frontier(username)''',
+    ],
+    [
+        # Accounts are referenced by GitHub's numeric id instead of their login, so a rename
+        # only touches github_users. Every referenced login gets a row first, and rows whose
+        # GitHub id isn't known yet get a provisional negative one until a refresh sees it
+        '''INSERT OR IGNORE INTO github_users (username)
+           SELECT related_user FROM connections
+           UNION SELECT related_user FROM connection_events
+           UNION SELECT follower FROM graph_edges
+           UNION SELECT followee FROM graph_edges
+           UNION SELECT username FROM crawl_frontier''',
+        '''UPDATE github_users SET github_id = -id WHERE github_id IS NULL''',
+        '''CREATE TRIGGER IF NOT EXISTS github_users_provisional_id AFTER INSERT ON github_users
+        WHEN new.github_id IS NULL BEGIN
+            UPDATE github_users SET github_id = -new.id WHERE id = new.id;
+        END''',
+        '''CREATE TABLE connections_by_id (
+            main_user TEXT,
+            related_id INTEGER,
+            is_following BOOLEAN,
+            is_follower BOOLEAN,
+            last_updated TIMESTAMP,
+            PRIMARY KEY (main_user, related_id)
+        )''',
+        '''INSERT INTO connections_by_id
+           SELECT c.main_user, u.github_id, c.is_following, c.is_follower, c.last_updated
+           FROM connections c JOIN github_users u ON u.username = c.related_user''',
+        '''DROP TABLE connections''',
+        '''ALTER TABLE connections_by_id RENAME TO connections''',
+        '''CREATE INDEX idx_connections_main_user
+           ON connections(main_user, is_following, is_follower, related_id)''',
+        '''CREATE INDEX idx_connections_related_id ON connections(related_id)''',
+        '''CREATE TABLE connection_events_by_id (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            main_user TEXT,
+            related_id INTEGER,
+            relation TEXT,
+            action INTEGER,
+            occurred_at TIMESTAMP
+        )''',
+        '''INSERT INTO connection_events_by_id
+           SELECT e.id, e.main_user, u.github_id, e.relation, e.action, e.occurred_at
+           FROM connection_events e JOIN github_users u ON u.username = e.related_user''',
+        '''DROP TABLE connection_events''',
+        '''ALTER TABLE connection_events_by_id RENAME TO connection_events''',
+        '''CREATE INDEX idx_connection_events_state
+           ON connection_events(main_user, related_id, relation, occurred_at, action)''',
+        '''CREATE INDEX idx_connection_events_time ON connection_events(main_user, occurred_at)''',
+        '''CREATE INDEX idx_connection_events_related_id ON connection_events(related_id)''',
+        '''CREATE TABLE graph_edges_by_id (
+            follower_id INTEGER,
+            followee_id INTEGER,
+            PRIMARY KEY (follower_id, followee_id)
+        ) WITHOUT ROWID''',
+        '''INSERT OR IGNORE INTO graph_edges_by_id
+           SELECT f.github_id, t.github_id FROM graph_edges e
+           JOIN github_users f ON f.username = e.follower
+           JOIN github_users t ON t.username = e.followee''',
+        '''DROP TABLE graph_edges''',
+        '''ALTER TABLE graph_edges_by_id RENAME TO graph_edges''',
+        '''CREATE INDEX idx_graph_edges_followee ON graph_edges(followee_id, follower_id)''',
+        # root stays a login: like main_user, it names the analyzed account
+        '''CREATE TABLE crawl_frontier_by_id (
+            root TEXT,
+            node_id INTEGER,
+            depth INTEGER,
+            status TEXT,
+            expanded_at TIMESTAMP,
+            PRIMARY KEY (root, node_id)
+        )''',
+        '''INSERT INTO crawl_frontier_by_id
+           SELECT f.root, u.github_id, f.depth, f.status, f.expanded_at
+           FROM crawl_frontier f JOIN github_users u ON u.username = f.username
+           ORDER BY f.rowid''',
+        '''DROP TABLE crawl_frontier''',
+        '''ALTER TABLE crawl_frontier_by_id RENAME TO crawl_frontier''',
+        '''CREATE INDEX idx_crawl_frontier_pending ON crawl_frontier(root, status, depth)''',
+        '''CREATE INDEX idx_crawl_frontier_node_id ON crawl_frontier(node_id)''',
+    ],
+]
+
+def migrate_database(conn):
+    """Apply any MIGRATIONS the database hasn't seen yet, each in a transaction of its own
+    
+    BEGIN IMMEDIATE takes the write lock before user_version is read, so processes that
+    start at the same time apply each migration once between them, and a migration that
+    fails part way is rolled back together with its version bump.
+    """
+    # The sqlite3 module would commit around the DDL on its own; run statements as given
+    isolation_level, conn.isolation_level = conn.isolation_level, None
+    try:
+        while True:
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                version = conn.execute('PRAGMA user_version').fetchone()[0]
+                if version < len(MIGRATIONS):
+                    for statement in MIGRATIONS[version]:
+                        conn.execute(statement)
+                    conn.execute(f'PRAGMA user_version = {version + 1}')
+            except BaseException:
+                conn.execute('ROLLBACK')
+                raise
+            conn.execute('COMMIT')
+            if version >= len(MIGRATIONS):
+                return
+    finally:
+        conn.isolation_level = isolation_level
+
+def initialize_database():
+    """Initialize SQLite database with necessary tables"""
+    # Ensure the data directory exists
+    os.makedirs("data", exist_ok=True)
+    
+    # Connect to the database (will create it if it doesn't exist)
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    
+    # Create main_users table to store the users we've analyzed
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS main_users (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        username TEXT UNIQUE,
+        last_updated TIMESTAMP
+    )
+    ''')
+    
+    # Create connections table to store follower/following relationships
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS github_users (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        username TEXT UNIQUE,
+        name TEXT,
+        bio TEXT,
+        avatar_url TEXT,
+        location TEXT,
+        public_repos INTEGER,
+        last_updated TIMESTAMP
+    )
+    ''')
+    
+    # Create connections table to store follower/following relationships
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS connections (
+        main_user TEXT,
+        related_user TEXT,
+        is_following BOOLEAN,
+        is_follower BOOLEAN,
+        last_updated TIMESTAMP,
+        PRIMARY KEY (main_user, related_user)
+    )
+    ''')
+    
+    # Create fetch_jobs table to checkpoint pages and profile lookups of a refresh
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS fetch_jobs (
+        main_user TEXT,
+        kind TEXT,
+        target TEXT,
+        status TEXT,
+        result TEXT,
+        updated_at TIMESTAMP,
+        PRIMARY KEY (main_user, kind, target)
+    )
+    ''')
+    
+    conn.commit()
+    migrate_database(conn)
+    backfill_summaries(conn)
+    conn.close()
+
+def get_stale_profiles(cursor, usernames, ttl_hours):
+    """Return the usernames whose stored profile is missing or older than ttl_hours"""
+    cutoff = (datetime.now() - timedelta(hours=ttl_hours)).isoformat()
+    fresh = set()
+    usernames = list(usernames)
+    # Stay well below SQLite's bound-parameter limit
+    for start in range(0, len(usernames), 500):
+        chunk = usernames[start:start + 500]
+        cursor.execute(f'''
+        SELECT username FROM github_users
+        WHERE username IN ({','.join('?' * len(chunk))}) AND last_updated >= ?
+        ''', (*chunk, cutoff))
+        fresh.update(row[0] for row in cursor.fetchall())
+    return [user for user in usernames if user not in fresh]
+
+def diff_connections(cursor, username, followers, following):
+    """Compare stored connections with fresh lists, returning (upserts, removals, events)
+    
+    followers and following are sets of GitHub ids, as are the ids in the results.
+    events are (related_id, relation, action) tuples for the connection_events log,
+    where relation is 'following' or 'follower' and action is 1 for a follow, 0 for an unfollow.
+    """
+    cursor.execute('''
+    SELECT related_id, is_following, is_follower FROM connections
+    WHERE main_user = ?
+    ''', (username,))
+    stored = {row[0]: (bool(row[1]), bool(row[2])) for row in cursor.fetchall()}
+    
+    upserts = []
+    events = []
+    for user in followers | following:
+        state = (user in following, user in followers)
+        old_state = stored.get(user, (False, False))
+        if stored.get(user) != state:
+            upserts.append((user, *state))
+        if old_state[0] != state[0]:
+            events.append((user, 'following', int(state[0])))
+        if old_state[1] != state[1]:
+            events.append((user, 'follower', int(state[1])))
+    removals = [user for user in stored if user not in followers and user not in following]
+    for user in removals:
+        if stored[user][0]:
+            events.append((user, 'following', 0))
+        if stored[user][1]:
+            events.append((user, 'follower', 0))
+    return upserts, removals, events
+
+# Columns referring to an account by GitHub id; each leads an index, so swapping a
+# provisional id for the real one costs a few lookups however long the history is
+ACCOUNT_ID_COLUMNS = [
+    ('connections', 'related_id'),
+    ('connection_events', 'related_id'),
+    ('graph_edges', 'follower_id'),
+    ('graph_edges', 'followee_id'),
+    ('crawl_frontier', 'node_id'),
+]
+
+# Columns holding the login of an analyzed account, which follow it when it is renamed
+LOGIN_COLUMNS = [
+    ('main_users', 'username'),
+    ('connections', 'main_user'),
+    ('connection_events', 'main_user'),
+    ('crawl_frontier', 'root'),
+    ('user_summary', 'main_user'),
+    ('user_location_counts', 'main_user'),
+    ('summary_snapshots', 'main_user'),
+    ('refresh_schedules', 'username'),
+]
+
+def move_account_id(cursor, old_id, new_id):
+    """Point every stored reference to the account old_id at new_id"""
+    for table, column in ACCOUNT_ID_COLUMNS:
+        # Rows that would collide with ones already stored under new_id are dropped
+        cursor.execute(f'UPDATE OR IGNORE {table} SET {column} = ? WHERE {column} = ?', (new_id, old_id))
+        cursor.execute(f'DELETE FROM {table} WHERE {column} = ?', (old_id,))
+
+def rename_login(cursor, old, new):
+    """Move a renamed account from its old login to the new one, which must be free
+    
+    Connections refer to the account by GitHub id, so only its github_users row, the
+    rows it owns as an analyzed account and the summary top lists naming it change.
+    """
+    cursor.execute('UPDATE github_users SET username = ? WHERE username = ?', (new, old))
+    cursor.execute('SELECT 1 FROM main_users WHERE username = ?', (old,))
+    if cursor.fetchone():
+        for table, column in LOGIN_COLUMNS:
+            cursor.execute(f'UPDATE OR IGNORE {table} SET {column} = ? WHERE {column} = ?', (new, old))
+            cursor.execute(f'DELETE FROM {table} WHERE {column} = ?', (old,))
+    
+    # The top lists in user_summary name connections by login; there is one row per
+    # analyzed account, so the JSON is searched directly
+    cursor.execute('''
+    SELECT main_user, top_not_following_back, top_follow_back FROM user_summary
+    WHERE instr(top_not_following_back, ?) OR instr(top_follow_back, ?)
+    ''', (json.dumps(old),) * 2)
+    for main_user, *top_lists in cursor.fetchall():
+        top_lists = [json.dumps([[new if login == old else login, *rest] for login, *rest in json.loads(top_list)])
+                     for top_list in top_lists]
+        cursor.execute('''
+        UPDATE user_summary SET top_not_following_back = ?, top_follow_back = ?
+        WHERE main_user = ?
+        ''', (*top_lists, main_user))
+
+def _stored_accounts(cursor, column, values):
+    """(username, github_id) rows of github_users whose column is one of values"""
+    values = list(values)
+    rows = []
+    # Stay well below SQLite's bound-parameter limit
+    for start in range(0, len(values), 500):
+        chunk = values[start:start + 500]
+        cursor.execute(f'''
+        SELECT username, github_id FROM github_users
+        WHERE {column} IN ({','.join('?' * len(chunk))})
+        ''', chunk)
+        rows.extend(cursor.fetchall())
+    return rows
+
+def apply_renames(cursor, github_ids):
+    """Record GitHub ids of logins and move accounts stored under an earlier login to the current one
+    
+    github_ids maps login to GitHub's numeric id; every login ends up with a github_users
+    row holding that id. A row stored under the login with a provisional id hands its
+    references over to the real one, and a row left there by an account that has since
+    been renamed gives the login up; its references come back with its next login.
+    Returns the (login, GitHub id) pairs whose stored login or id changed.
+    """
+    github_ids = {login: github_id for login, github_id in github_ids.items() if github_id}
+    login_of = {github_id: login for login, github_id in _stored_accounts(cursor, 'github_id', github_ids.values())}
+    id_of = dict(_stored_accounts(cursor, 'username', github_ids))
+    changed = []
+    for login, github_id in github_ids.items():
+        current = login_of.get(github_id)
+        if current == login:
+            continue
+        holder = id_of.pop(login, None)
+        if holder is not None and holder < 0 and current is None:
+            # Stored before its id was known: keep the row and swap in the real id
+            move_account_id(cursor, holder, github_id)
+            cursor.execute('UPDATE github_users SET github_id = ? WHERE github_id = ?', (github_id, holder))
+        else:
+            if holder is not None:
+                cursor.execute('DELETE FROM github_users WHERE username = ?', (login,))
+                login_of.pop(holder, None)
+                if holder < 0:
+                    move_account_id(cursor, holder, github_id)
+            if current is None:
+                cursor.execute('INSERT INTO github_users (username, github_id) VALUES (?, ?)', (login, github_id))
+            else:
+                rename_login(cursor, current, login)
+                id_of.pop(current, None)
+        login_of[github_id] = login
+        id_of[login] = github_id
+        if current is not None or holder is not None:
+            changed.append((login, github_id))
+    return changed
+
+def intern_logins(cursor, logins):
+    """Return {login: GitHub id} for logins, adding rows with provisional ids for unknown ones"""
+    logins = list(logins)
+    cursor.executemany('''
+    INSERT OR IGNORE INTO github_users (username, last_updated)
+    VALUES (?, NULL)
+    ''', [(login,) for login in logins])
+    return dict(_stored_accounts(cursor, 'username', logins))
+
+def write_profiles(cursor, profile_rows, missing_rows=()):
+    """Bulk upsert fetched profiles; missing_rows only get a placeholder if the user is new
+    
+    Profile rows are (username, github_id, name, bio, avatar_url, location, public_repos, last_updated).
+    """
+    # Keeps github_id unique when a profile arrives under a login we haven't seen it under
+    apply_renames(cursor, {row[0]: row[1] for row in profile_rows})
+    # Upsert rather than INSERT OR REPLACE so existing rows keep their id and
+    # indexes are updated in place instead of delete + reinsert
+    cursor.executemany('''
+    INSERT INTO github_users
+    (username, github_id, name, bio, avatar_url, location, public_repos, last_updated)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+    ON CONFLICT(username) DO UPDATE SET
+        github_id = COALESCE(excluded.github_id, github_users.github_id),
+        name = excluded.name,
+        bio = excluded.bio,
+        avatar_url = excluded.avatar_url,
+        location = excluded.location,
+        public_repos = excluded.public_repos,
+        last_updated = excluded.last_updated
+    ''', profile_rows)
+    # Keep whatever we already know and leave the row stale so the next refresh retries it
+    cursor.executemany('''
+    INSERT OR IGNORE INTO github_users (username, last_updated)
+    VALUES (?, NULL)
+    ''', missing_rows)
+
+# Top connections by public repos kept in user_summary; NetworkMetrics ranks the same way
+SUMMARY_TOP_QUERY = '''
+SELECT u.username, u.name, COALESCE(u.public_repos, 0), u.location
+FROM connections c
+JOIN github_users u ON u.github_id = c.related_id
+WHERE c.main_user = ? {status}
+ORDER BY COALESCE(u.public_repos, 0) DESC, u.username
+LIMIT ?
+'''
+
+def write_summary(cursor, username, followers, following, taken_at):
+    """Refresh the stored aggregates of username inside the caller's ingest transaction
+    
+    Counts come straight from the fetched follower/following sets; the location
+    histogram and top lists are one aggregate query each over the rows just written.
+    """
+    followers, following = set(followers), set(following)
+    counts = (len(followers | following), len(following), len(followers), len(followers & following))
+    
+    cursor.execute(SUMMARY_TOP_QUERY.format(status=STATUS_FILTERS['not_following_back']), (username, 10))
+    top_not_following_back = cursor.fetchall()
+    cursor.execute(SUMMARY_TOP_QUERY.format(status=STATUS_FILTERS['follow_back']), (username, 5))
+    top_follow_back = cursor.fetchall()
+    
+    cursor.execute('''
+    INSERT INTO user_summary
+    (main_user, network_size, following_count, followers_count, mutual_count,
+     top_not_following_back, top_follow_back, updated_at)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+    ON CONFLICT(main_user) DO UPDATE SET
+        network_size = excluded.network_size,
+        following_count = excluded.following_count,
+        followers_count = excluded.followers_count,
+        mutual_count = excluded.mutual_count,
+        top_not_following_back = excluded.top_not_following_back,
+        top_follow_back = excluded.top_follow_back,
+        updated_at = excluded.updated_at
+    ''', (username, *counts, json.dumps(top_not_following_back), json.dumps(top_follow_back), taken_at))
+    
+    cursor.execute('DELETE FROM user_location_counts WHERE main_user = ?', (username,))
+    cursor.execute('''
+    INSERT INTO user_location_counts (main_user, location, connections)
+    SELECT c.main_user, u.location, COUNT(*)
+    FROM connections c
+    JOIN github_users u ON u.github_id = c.related_id
+    WHERE c.main_user = ? AND u.location IS NOT NULL AND u.location != ''
+    GROUP BY u.location
+    ''', (username,))
+    
+    cursor.execute('''
+    INSERT OR REPLACE INTO summary_snapshots
+    (main_user, taken_at, network_size, following_count, followers_count, mutual_count)
+    VALUES (?, ?, ?, ?, ?, ?)
+    ''', (username, taken_at, *counts))
+
+def backfill_summaries(conn):
+    """Build summaries for analyzed users stored before user_summary existed"""
+    usernames = conn.execute('''
+    SELECT m.username, m.last_updated FROM main_users m
+    LEFT JOIN user_summary s ON s.main_user = m.username
+    WHERE s.main_user IS NULL
+    ''').fetchall()
+    cursor = conn.cursor()
+    for username, last_updated in usernames:
+        with conn:
+            cursor.execute('''
+            SELECT related_id, is_following, is_follower FROM connections
+            WHERE main_user = ?
+            ''', (username,))
+            rows = cursor.fetchall()
+            followers = [user for user, _, is_follower in rows if is_follower]
+            following = [user for user, is_following, _ in rows if is_following]
+            write_summary(cursor, username, followers, following, last_updated)
+
+class FetchJobQueue:
+    """Persist completed pages and profile lookups so an interrupted refresh can resume
+    
+    Safe to share between the threads of one refresh; calls are serialized on a lock.
+    Completed jobs are buffered in memory and written commit_every at a time in a short
+    transaction, so the queue never holds the write lock while other writers (the
+    pipeline, the refresh worker) need it. Jobs older than max_age_hours are dropped
+    when the queue is opened, so only a recently interrupted refresh is resumed.
+    """
+    def __init__(self, main_user, db_path=DB_PATH, commit_every=100, max_age_hours=FETCH_JOB_MAX_AGE_HOURS):
+        self.main_user = main_user
+        self.conn = get_db_connection(db_path, check_same_thread=False)
+        self.lock = threading.RLock()
+        self.commit_every = commit_every
+        # {(kind, target): (result JSON, updated_at)} not written yet
+        self.pending = {}
+        self.expire(max_age_hours)
+    
+    def expire(self, max_age_hours):
+        """Drop jobs for this user that were queued or completed more than max_age_hours ago"""
+        cutoff = (datetime.now() - timedelta(hours=max_age_hours)).isoformat()
+        with self.lock, self.conn:
+            self.conn.execute('DELETE FROM fetch_jobs WHERE main_user = ? AND updated_at < ?',
+                              (self.main_user, cutoff))
+
+    def get(self, kind, target):
+        """Return (status, result) for a job, or None if it was never queued"""
+        with self.lock:
+            if (kind, target) in self.pending:
+                return 'done', json.loads(self.pending[(kind, target)][0])
+            row = self.conn.execute('''
+            SELECT status, result FROM fetch_jobs
+            WHERE main_user = ? AND kind = ? AND target = ?
+            ''', (self.main_user, kind, target)).fetchone()
+        if row is None:
+            return None
+        return row[0], json.loads(row[1]) if row[1] is not None else None
+
+    def enqueue(self, kind, targets):
+        """Queue jobs that aren't already known"""
+        with self.lock:
+            self.conn.executemany('''
+            INSERT OR IGNORE INTO fetch_jobs (main_user, kind, target, status, updated_at)
+            VALUES (?, ?, ?, 'pending', ?)
+            ''', [(self.main_user, kind, target, datetime.now().isoformat()) for target in targets])
+            self.conn.commit()
+
+    def completed(self, kind):
+        """Return {target: result} for every finished job of the given kind"""
+        with self.lock:
+            rows = self.conn.execute('''
+            SELECT target, result FROM fetch_jobs
+            WHERE main_user = ? AND kind = ? AND status = 'done'
+            ''', (self.main_user, kind)).fetchall()
+            rows += [(target, result) for (job_kind, target), (result, _) in self.pending.items()
+                     if job_kind == kind]
+        return {target: json.loads(result) if result is not None else None for target, result in rows}
+
+    def complete(self, kind, target, result):
+        """Mark a job done and store its result"""
+        with self.lock:
+            self.pending[(kind, target)] = (json.dumps(result), datetime.now().isoformat())
+            if len(self.pending) >= self.commit_every:
+                self.flush()
+
+    def flush(self):
+        """Write buffered completions in one transaction"""
+        with self.lock:
+            if not self.pending:
+                return
+            with self.conn:
+                self.conn.executemany('''
+                INSERT OR REPLACE INTO fetch_jobs (main_user, kind, target, status, result, updated_at)
+                VALUES (?, ?, ?, 'done', ?, ?)
+                ''', [(self.main_user, kind, target, result, updated_at)
+                      for (kind, target), (result, updated_at) in self.pending.items()])
+            self.pending = {}
+
+    def queued(self, kind):
+        """Return the targets of the given kind that were queued but never completed"""
+        with self.lock:
+            rows = self.conn.execute('''
+            SELECT target FROM fetch_jobs
+            WHERE main_user = ? AND kind = ? AND status = 'pending'
+            ''', (self.main_user, kind)).fetchall()
+        return {row[0] for row in rows if (kind, row[0]) not in self.pending}
+
+    def clear(self):
+        """Drop this user's completed jobs once their results have been saved or can't be used
+        
+        Jobs that never completed, e.g. profile lookups that failed, stay queued so the
+        next refresh retries them.
+        """
+        with self.lock:
+            self.pending = {}
+            with self.conn:
+                self.conn.execute("DELETE FROM fetch_jobs WHERE main_user = ? AND status = 'done'",
+                                  (self.main_user,))
+
+    def close(self):
+        with self.lock:
+            self.flush()
+            self.conn.close()
+
+# Reads share one long-lived connection instead of a connect/close per query. With WAL
+# each SELECT sees the latest committed data, including writes from other processes.
+_read_lock = threading.RLock()
+_read_connection = None
+
+@contextmanager
+def read_connection():
+    """Yield the process-wide read-only connection, opening it on first use"""
+    global _read_connection
+    with _read_lock:
+        if _read_connection is None:
+            _read_connection = get_db_connection(check_same_thread=False)
+            _read_connection.execute('PRAGMA query_only = ON')
+        yield _read_connection
+
+class ConnectionsCache:
+    """LRU cache of get_user_connections results, bounded by DataFrame memory
+    
+    Entries are keyed by (username, main_users.last_updated), so any refresh of a user,
+    even one made by another process, produces a new key and the stale entry ages out.
+    """
+    def __init__(self, max_bytes=CONNECTIONS_CACHE_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()
+        self.total_bytes = 0
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            self.entries.move_to_end(key)
+            return entry[0]
+
+    def put(self, key, df):
+        size = int(df.memory_usage(deep=True).sum())
+        with self.lock:
+            if key in self.entries:
+                self.total_bytes -= self.entries.pop(key)[1]
+            self.entries[key] = (df, size)
+            self.total_bytes += size
+            # Always keep the newest entry, even if it alone exceeds the budget
+            while self.total_bytes > self.max_bytes and len(self.entries) > 1:
+                _, (_, evicted_size) = self.entries.popitem(last=False)
+                self.total_bytes -= evicted_size
+
+    def invalidate(self, username):
+        """Drop every cached version of a user's connections"""
+        with self.lock:
+            for key in [key for key in self.entries if key[0] == username]:
+                self.total_bytes -= self.entries.pop(key)[1]
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.total_bytes = 0
+
+connections_cache = ConnectionsCache()
+
+def get_analyzed_users():
+    """Get list of users that have been analyzed"""
+    with read_connection() as conn:
+        cursor = conn.cursor()
+        
+        cursor.execute('''
+        SELECT username, last_updated FROM main_users
+        ORDER BY last_updated DESC
+        ''')
+        
+        users = cursor.fetchall()
+    
+    return users
+
+@timed('database.get_user_connections')
+def get_user_connections(username):
+    """Get connections data for a specific user as a DataFrame with boolean follow columns
+    
+    Results are cached per refresh of the user; treat the returned DataFrame as read-only.
+    """
+    with read_connection() as conn:
+        row = conn.execute('SELECT last_updated FROM main_users WHERE username = ?', (username,)).fetchone()
+        key = (username, row[0] if row else None)
+        df = connections_cache.get(key)
+        perf.count('connections_cache.hits' if df is not None else 'connections_cache.misses')
+        if df is not None:
+            return df
+        
+        df = pd.read_sql_query('''
+        SELECT 
+            u.username,
+            c.is_following as following,
+            c.is_follower as follower,
+            u.name,
+            u.bio,
+            u.avatar_url,
+            u.location,
+            u.public_repos,
+            'https://github.com/' || u.username as link
+        FROM connections c
+        JOIN github_users u ON u.github_id = c.related_id
+        WHERE c.main_user = ?
+        ''', conn, params=(username,))
+    
+    df['following'] = df['following'].astype(bool)
+    df['follower'] = df['follower'].astype(bool)
+    df['public_repos'] = df['public_repos'].fillna(0).astype('int64')
+    connections_cache.put(key, df)
+    return df
+
+# Follow-status filters for get_connections_page; each maps onto the
+# (main_user, is_following, is_follower, related_id) index
+STATUS_FILTERS = {
+    'all': '',
+    'mutual': 'AND c.is_following AND c.is_follower',
+    'not_following_back': 'AND c.is_following AND NOT c.is_follower',
+    'follow_back': 'AND NOT c.is_following AND c.is_follower',
+    'following': 'AND c.is_following',
+    'followers': 'AND c.is_follower',
+}
+
+SORT_ORDERS = {
+    # Only with a search query; bm25 rank, best match first
+    'relevance': 'f.rank IS NULL, f.rank, u.username',
+    'username': 'u.username',
+    'public_repos': 'u.public_repos DESC, u.username',
+    'name': 'u.name IS NULL, u.name COLLATE NOCASE, u.username',
+}
+
+def fts_query(text):
+    """FTS5 query matching every word of free text as a prefix, with FTS5 syntax characters quoted away"""
+    words = [word.replace('"', '""') for word in text.split()]
+    return ' '.join(f'"{word}"*' for word in words)
+
+def get_connections_page(username, status='all', sort='username', limit=24, offset=0, query=None,
+                         location=None, min_repos=None, max_repos=None):
+    """Return (page DataFrame, total matching rows) for one page of a user's connections
+    
+    query is matched against name, bio and location through the github_users_fts index,
+    and as a substring of the username; location must match exactly (ignoring case).
+    """
+    joins = ''
+    join_params = []
+    where = STATUS_FILTERS[status]
+    where_params = []
+    if query and query.strip():
+        # Matches are collected from the index once, then joined by rowid
+        joins = """
+        LEFT JOIN (SELECT rowid, rank FROM github_users_fts WHERE github_users_fts MATCH ?) f
+            ON f.rowid = u.id"""
+        join_params.append(fts_query(query))
+        where += " AND (f.rowid IS NOT NULL OR u.username LIKE ? ESCAPE '\\')"
+        escaped = query.strip().replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+        where_params.append(f"%{escaped}%")
+    elif sort == 'relevance':
+        sort = 'username'
+    if location:
+        where += ' AND u.location = ? COLLATE NOCASE'
+        where_params.append(location)
+    if min_repos is not None:
+        where += ' AND COALESCE(u.public_repos, 0) >= ?'
+        where_params.append(min_repos)
+    if max_repos is not None:
+        where += ' AND COALESCE(u.public_repos, 0) <= ?'
+        where_params.append(max_repos)
+    params = [*join_params, username, *where_params]
+    
+    with read_connection() as conn:
+        if where_params:
+            total = conn.execute(f'''
+            SELECT COUNT(*) FROM connections c
+            JOIN github_users u ON u.github_id = c.related_id {joins}
+            WHERE c.main_user = ? {where}
+            ''', params).fetchone()[0]
+        else:
+            # Follow-status filters alone are counted from the connections index
+            total = conn.execute(f'''
+            SELECT COUNT(*) FROM connections c
+            WHERE c.main_user = ? {where}
+            ''', (username,)).fetchone()[0]
+        
+        df = pd.read_sql_query(f'''
+        SELECT 
+            u.username,
+            c.is_following as following,
+            c.is_follower as follower,
+            u.name,
+            u.bio,
+            u.avatar_url,
+            u.location,
+            u.public_repos,
+            'https://github.com/' || u.username as link
+        FROM connections c
+        JOIN github_users u ON u.github_id = c.related_id {joins}
+        WHERE c.main_user = ? {where}
+        ORDER BY {SORT_ORDERS[sort]}
+        LIMIT ? OFFSET ?
+        ''', conn, params=(*params, limit, offset))
+    
+    df['following'] = df['following'].astype(bool)
+    df['follower'] = df['follower'].astype(bool)
+    return df, total
+
+def get_location_options(username):
+    """Locations of a user's connections, most common first, from the summary written at ingest"""
+    with read_connection() as conn:
+        rows = conn.execute('''
+        SELECT location FROM user_location_counts
+        WHERE main_user = ?
+        ORDER BY connections DESC, location
+        ''', (username,)).fetchall()
+    return [row[0] for row in rows]
+
+def get_connections_as_of(username, timestamp):
+    """Reconstruct a user's followers and following as they were at the given ISO timestamp"""
+    with read_connection() as conn:
+        cursor = conn.cursor()
+        
+        # SQLite returns the other columns from the row holding MAX(occurred_at),
+        # i.e. the latest event for each (related_id, relation); accounts show under
+        # their current login
+        cursor.execute('''
+        SELECT u.username, e.relation, e.action, MAX(e.occurred_at)
+        FROM connection_events e
+        JOIN github_users u ON u.github_id = e.related_id
+        WHERE e.main_user = ? AND e.occurred_at <= ?
+        GROUP BY e.related_id, e.relation
+        ''', (username, timestamp))
+        rows = cursor.fetchall()
+    
+    state = {'followers': set(), 'following': set()}
+    for login, relation, action, _ in rows:
+        if action:
+            state['followers' if relation == 'follower' else 'following'].add(login)
+    return state
+
+def get_network_growth(username):
+    """Follower and following counts after every refresh that changed them"""
+    with read_connection() as conn:
+        df = pd.read_sql_query('''
+        SELECT occurred_at,
+               SUM(CASE WHEN relation = 'follower' THEN 2 * action - 1 ELSE 0 END) AS followers,
+               SUM(CASE WHEN relation = 'following' THEN 2 * action - 1 ELSE 0 END) AS following
+        FROM connection_events
+        WHERE main_user = ?
+        GROUP BY occurred_at
+        ORDER BY occurred_at
+        ''', conn, params=(username,))
+    
+    df['occurred_at'] = pd.to_datetime(df['occurred_at'])
+    df[['followers', 'following']] = df[['followers', 'following']].cumsum()
+    return df
+
+def record_perf_run(record):
+    """Store one instrumentation run record from instrumentation.perf_run"""
+    conn = get_db_connection()
+    with conn:
+        conn.execute('''
+        INSERT INTO perf_runs
+        (kind, label, status, started_at, seconds, http_requests, http_bytes, quota_used, http_cache_hit_rate, details)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ''', (record['kind'], record.get('label'), record.get('status'), record['started_at'], record['seconds'],
+              record['http_requests'], record['http_bytes'], record['quota_used'], record['http_cache_hit_rate'],
+              json.dumps(record, default=str)))
+    conn.close()
+
+def get_perf_runs(label, kind='refresh', limit=20):
+    """Most recent instrumented runs for a user, newest first"""
+    with read_connection() as conn:
+        return pd.read_sql_query('''
+        SELECT started_at, status, seconds, http_requests, http_bytes, quota_used, http_cache_hit_rate
+        FROM perf_runs
+        WHERE kind = ? AND label = ?
+        ORDER BY started_at DESC
+        LIMIT ?
+        ''', conn, params=(kind, label, limit))
+
+def get_latest_perf_run(label, kind='refresh'):
+    """Full record of the most recent instrumented run for a user, or None"""
+    with read_connection() as conn:
+        row = conn.execute('''
+        SELECT details FROM perf_runs
+        WHERE kind = ? AND label = ?
+        ORDER BY started_at DESC
+        LIMIT 1
+        ''', (kind, label)).fetchone()
+    return json.loads(row[0]) if row else None
+
+def get_user_summary(username):
+    """Stored aggregates of one analyzed user as a dict, or None if there are none yet"""
+    with read_connection() as conn:
+        row = conn.execute('''
+        SELECT network_size, following_count, followers_count, mutual_count,
+               top_not_following_back, top_follow_back, updated_at
+        FROM user_summary
+        WHERE main_user = ?
+        ''', (username,)).fetchone()
+        if row is None:
+            return None
+        location_counts = conn.execute('''
+        SELECT location, connections FROM user_location_counts
+        WHERE main_user = ?
+        ORDER BY connections DESC, location
+        ''', (username,)).fetchall()
+    return {
+        'network_size': row[0],
+        'following_count': row[1],
+        'followers_count': row[2],
+        'mutual_count': row[3],
+        'top_not_following_back': json.loads(row[4]),
+        'top_follow_back': json.loads(row[5]),
+        'updated_at': row[6],
+        'location_counts': location_counts,
+    }
+
+def get_account_overview():
+    """One row per analyzed user with its stored counts and the change since the previous refresh"""
+    with read_connection() as conn:
+        df = pd.read_sql_query('''
+        WITH ranked AS (
+            SELECT main_user, followers_count, following_count,
+                   ROW_NUMBER() OVER (PARTITION BY main_user ORDER BY taken_at DESC) AS age
+            FROM summary_snapshots
+        )
+        SELECT s.main_user AS username, s.updated_at AS last_updated,
+               s.network_size, s.followers_count, s.following_count, s.mutual_count,
+               s.followers_count - p.followers_count AS followers_change,
+               s.following_count - p.following_count AS following_change
+        FROM user_summary s
+        LEFT JOIN ranked p ON p.main_user = s.main_user AND p.age = 2
+        ORDER BY s.updated_at DESC
+        ''', conn)
+    df['influence_ratio'] = (df['followers_count'] / df['following_count'].where(df['following_count'] > 0)).fillna(0)
+    return df
+
+def get_connection_ids(username):
+    """GitHub ids of a user's followers and following, as sorted int64 arrays"""
+    with read_connection() as conn:
+        # Answered from idx_connections_main_user alone
+        df = pd.read_sql_query('''
+        SELECT related_id, is_follower, is_following
+        FROM connections
+        WHERE main_user = ?
+        ORDER BY related_id
+        ''', conn, params=(username,))
+    ids = df['related_id'].to_numpy(dtype='int64')
+    return ids[df['is_follower'].to_numpy(dtype=bool)], ids[df['is_following'].to_numpy(dtype=bool)]
+
+def get_logins(ids):
+    """Current logins of accounts given by GitHub id, sorted alphabetically"""
+    ids = [int(user_id) for user_id in ids]
+    logins = []
+    with read_connection() as conn:
+        for start in range(0, len(ids), 500):
+            chunk = ids[start:start + 500]
+            logins.extend(row[0] for row in conn.execute(f'''
+            SELECT username FROM github_users WHERE github_id IN ({','.join('?' * len(chunk))})
+            ''', chunk))
+    return sorted(logins, key=str.lower)
+
+def get_refresh_state(username):
+    """Stored follower and following logins of username with its last full pagination, or None"""
+    with read_connection() as conn:
+        row = conn.execute('SELECT last_paginated_at FROM main_users WHERE username = ?', (username,)).fetchone()
+        if row is None:
+            return None
+        rows = conn.execute('''
+        SELECT u.username, c.is_following, c.is_follower
+        FROM connections c
+        JOIN github_users u ON u.github_id = c.related_id
+        WHERE c.main_user = ?
+        ''', (username,)).fetchall()
+    return {
+        'followers': {user for user, _, is_follower in rows if is_follower},
+        'following': {user for user, is_following, _ in rows if is_following},
+        'last_paginated_at': row[0],
+    }
+
+def mark_checked(username, checked_at=None):
+    """Record a probe that found username's lists unchanged"""
+    conn = get_db_connection()
+    with conn:
+        conn.execute('UPDATE main_users SET last_checked_at = ? WHERE username = ?',
+                     (checked_at or datetime.now().isoformat(), username))
+    conn.close()
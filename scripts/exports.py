@@ -0,0 +1,198 @@
+"""On-demand exports streamed from SQLite to CSV, Parquet or Arrow files
+
+    python scripts/exports.py octocat --dataset connections --format parquet -o octocat.parquet
+
+Rows are read with fetchmany in chunks of EXPORT_CHUNK_SIZE and written as they
+arrive, so memory stays flat however large the network is. Parquet and Arrow
+need pyarrow; without it only CSV is offered.
+"""
+import argparse
+import csv
+import os
+import sys
+import threading
+
+from database import get_db_connection
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+
+EXPORT_DIR = 'data/exports'
+
+# Rows fetched from SQLite and written per chunk
+EXPORT_CHUNK_SIZE = 10000
+
+# Each dataset is one query parameterised by the analyzed username, plus its column types
+EXPORT_DATASETS = {
+    'connections': {
+        'label': "Connections",
+        'query': '''
+        SELECT
+            u.username,
+            c.is_following AS following,
+            c.is_follower AS follower,
+            u.name,
+            u.bio,
+            u.avatar_url,
+            u.location,
+            u.public_repos,
+            'https://github.com/' || u.username AS link
+        FROM connections c
+        JOIN github_users u ON u.github_id = c.related_id
+        WHERE c.main_user = ?
+        ORDER BY u.username
+        ''',
+        'columns': [('username', 'string'), ('following', 'bool'), ('follower', 'bool'), ('name', 'string'),
+                    ('bio', 'string'), ('avatar_url', 'string'), ('location', 'string'),
+                    ('public_repos', 'int64'), ('link', 'string')],
+    },
+    'profiles': {
+        'label': "Profiles",
+        'query': '''
+        SELECT u.username, u.name, u.bio, u.avatar_url, u.location, u.public_repos, u.last_updated
+        FROM connections c
+        JOIN github_users u ON u.github_id = c.related_id
+        WHERE c.main_user = ?
+        ORDER BY u.username
+        ''',
+        'columns': [('username', 'string'), ('name', 'string'), ('bio', 'string'), ('avatar_url', 'string'),
+                    ('location', 'string'), ('public_repos', 'int64'), ('last_updated', 'timestamp')],
+    },
+    'events': {
+        'label': "Follow/unfollow history",
+        'query': '''
+        SELECT u.username, e.relation,
+               CASE WHEN e.action THEN 'added' ELSE 'removed' END AS action,
+               e.occurred_at
+        FROM connection_events e
+        JOIN github_users u ON u.github_id = e.related_id
+        WHERE e.main_user = ?
+        ORDER BY e.occurred_at, e.id
+        ''',
+        'columns': [('username', 'string'), ('relation', 'string'), ('action', 'string'),
+                    ('occurred_at', 'timestamp')],
+    },
+}
+
+EXPORT_FORMATS = {
+    'csv': {'label': "CSV", 'extension': 'csv', 'mime': 'text/csv'},
+    'parquet': {'label': "Parquet", 'extension': 'parquet', 'mime': 'application/vnd.apache.parquet'},
+    'arrow': {'label': "Arrow IPC", 'extension': 'arrow', 'mime': 'application/vnd.apache.arrow.file'},
+}
+
+def available_formats():
+    """Export formats usable with the installed packages"""
+    return [fmt for fmt in EXPORT_FORMATS if fmt == 'csv' or pa is not None]
+
+def iter_chunks(dataset, username, chunk_size=EXPORT_CHUNK_SIZE):
+    """Yield lists of row tuples for a dataset, chunk_size rows at a time"""
+    # A dedicated connection, so a long export doesn't hold the shared read connection
+    conn = get_db_connection()
+    try:
+        cursor = conn.execute(EXPORT_DATASETS[dataset]['query'], (username,))
+        while True:
+            rows = cursor.fetchmany(chunk_size)
+            if not rows:
+                break
+            yield rows
+    finally:
+        conn.close()
+
+def write_csv(dataset, username, f, chunk_size=EXPORT_CHUNK_SIZE):
+    """Stream a dataset as CSV into the text file f, returning the number of rows"""
+    columns = EXPORT_DATASETS[dataset]['columns']
+    # Follow flags keep the Yes/No format of earlier CSV exports
+    flags = [i for i, (_, kind) in enumerate(columns) if kind == 'bool']
+    writer = csv.writer(f)
+    writer.writerow([name for name, _ in columns])
+    count = 0
+    for rows in iter_chunks(dataset, username, chunk_size):
+        if flags:
+            rows = [
+                [('Yes' if value else 'No') if i in flags else value for i, value in enumerate(row)]
+                for row in rows
+            ]
+        writer.writerows(rows)
+        count += len(rows)
+    return count
+
+def arrow_schema(dataset):
+    types = {'string': pa.string(), 'bool': pa.bool_(), 'int64': pa.int64(), 'timestamp': pa.timestamp('us')}
+    return pa.schema([(name, types[kind]) for name, kind in EXPORT_DATASETS[dataset]['columns']])
+
+def iter_record_batches(dataset, username, chunk_size=EXPORT_CHUNK_SIZE):
+    """Yield each chunk of a dataset as a typed Arrow record batch"""
+    schema = arrow_schema(dataset)
+    kinds = [kind for _, kind in EXPORT_DATASETS[dataset]['columns']]
+    for rows in iter_chunks(dataset, username, chunk_size):
+        arrays = []
+        for kind, field, values in zip(kinds, schema, zip(*rows)):
+            if kind == 'bool':
+                arrays.append(pa.array([None if v is None else bool(v) for v in values], pa.bool_()))
+            elif kind == 'timestamp':
+                # Stored as ISO 8601 text
+                arrays.append(pa.array(values, pa.string()).cast(field.type))
+            else:
+                arrays.append(pa.array(values, field.type))
+        yield pa.RecordBatch.from_arrays(arrays, schema=schema)
+
+def write_parquet(dataset, username, path, chunk_size=EXPORT_CHUNK_SIZE):
+    """Stream a dataset into a Parquet file, one row group per chunk, returning the number of rows"""
+    count = 0
+    with pq.ParquetWriter(path, arrow_schema(dataset), compression='zstd') as writer:
+        for batch in iter_record_batches(dataset, username, chunk_size):
+            writer.write_batch(batch)
+            count += batch.num_rows
+    return count
+
+def write_arrow(dataset, username, path, chunk_size=EXPORT_CHUNK_SIZE):
+    """Stream a dataset into an Arrow IPC file, returning the number of rows"""
+    count = 0
+    with pa.OSFile(path, 'wb') as sink, pa.ipc.new_file(sink, arrow_schema(dataset)) as writer:
+        for batch in iter_record_batches(dataset, username, chunk_size):
+            writer.write_batch(batch)
+            count += batch.num_rows
+    return count
+
+def export_dataset(dataset, username, fmt='csv', path=None, chunk_size=EXPORT_CHUNK_SIZE):
+    """Write one dataset for username to path, returning (path, row count)
+
+    The default path in EXPORT_DIR is reused by the next export of the same data, so
+    the directory doesn't grow. The file is written under a temporary name and
+    renamed when complete, so a half-written export is never picked up.
+    """
+    if fmt not in available_formats():
+        raise ValueError(f"Export format {fmt!r} is not available; install pyarrow for Parquet and Arrow")
+    if path is None:
+        os.makedirs(EXPORT_DIR, exist_ok=True)
+        path = os.path.join(EXPORT_DIR, f"{username}_{dataset}.{EXPORT_FORMATS[fmt]['extension']}")
+    tmp_path = f"{path}.{threading.get_ident()}.tmp"
+    if fmt == 'csv':
+        with open(tmp_path, 'w', newline='', encoding='utf-8') as f:
+            count = write_csv(dataset, username, f, chunk_size)
+    elif fmt == 'parquet':
+        count = write_parquet(dataset, username, tmp_path, chunk_size)
+    else:
+        count = write_arrow(dataset, username, tmp_path, chunk_size)
+    os.replace(tmp_path, path)
+    return path, count
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Export stored GitHub network data")
+    parser.add_argument('username', help="Analyzed GitHub username")
+    parser.add_argument('--dataset', choices=list(EXPORT_DATASETS), default='connections')
+    parser.add_argument('--format', dest='fmt', choices=list(EXPORT_FORMATS), default='csv')
+    parser.add_argument('-o', '--output', help=f"Output file (defaults to a new file in {EXPORT_DIR})")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    path, count = export_dataset(args.dataset, args.username, args.fmt, args.output)
+    print(f"Wrote {count} rows to {path}")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,645 @@
+"""GitHub REST/GraphQL client: rate-limit-aware scheduling, response caching and profile enrichment"""
+import requests
+import os
+import re
+import time
+import hashlib
+import sqlite3
+import threading
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from datetime import datetime
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+from requests.adapters import HTTPAdapter
+
+from instrumentation import in_run_context, perf, timed
+
+# Overridable so the app can be pointed at GitHub Enterprise or a local mock server
+GITHUB_API_URL = os.environ.get('GITHUB_API_URL', 'https://api.github.com').rstrip('/')
+GITHUB_GRAPHQL_URL = os.environ.get('GITHUB_GRAPHQL_URL', f'{GITHUB_API_URL}/graphql')
+
+# Largest page size GitHub's list endpoints allow
+PER_PAGE = 100
+
+# GitHub caps GraphQL queries at 100 aliased user lookups
+GRAPHQL_BATCH_SIZE = 100
+
+# Default number of profile lookups allowed in flight at once
+DEFAULT_MAX_WORKERS = 16
+
+# Longest we will sleep waiting for a rate limit reset before giving up
+# and leaving the remaining work in the job queue
+MAX_RATE_LIMIT_WAIT = 60
+
+# Once fewer than this many requests remain, spread them evenly until the reset
+PACING_THRESHOLD = 100
+
+HTTP_CACHE_PATH = 'data/http_cache.db'
+
+# Upper bound on the stored response bodies before least recently used entries are evicted
+HTTP_CACHE_MAX_BYTES = 64 * 1024 * 1024
+
+def create_session(pool_size=DEFAULT_MAX_WORKERS):
+    """Create an HTTP session whose connection pool can serve pool_size concurrent requests"""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
+
+class RateLimitExceeded(Exception):
+    """Raised when GitHub's rate limit won't reset within MAX_RATE_LIMIT_WAIT"""
+    def __init__(self, reset_at):
+        self.reset_at = reset_at
+        reset_time = datetime.fromtimestamp(reset_at).strftime('%H:%M:%S')
+        super().__init__(f"GitHub API rate limit exhausted until {reset_time}")
+
+class ResponseCache:
+    """On-disk store of GitHub responses used for conditional (ETag / Last-Modified) requests"""
+    def __init__(self, path=HTTP_CACHE_PATH, max_bytes=HTTP_CACHE_MAX_BYTES):
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        self.conn.execute('''
+        CREATE TABLE IF NOT EXISTS http_cache (
+            cache_key TEXT PRIMARY KEY,
+            url TEXT,
+            etag TEXT,
+            last_modified TEXT,
+            link TEXT,
+            body BLOB,
+            size INTEGER,
+            last_access REAL
+        )
+        ''')
+        self.conn.execute('CREATE INDEX IF NOT EXISTS idx_http_cache_last_access ON http_cache(last_access)')
+        self.total_bytes = self.conn.execute('SELECT COALESCE(SUM(size), 0) FROM http_cache').fetchone()[0]
+
+    @staticmethod
+    def key(url, token=None):
+        """Cache key for a URL; tokens only decide the auth scope and never enter the key"""
+        scope = 'auth' if token else 'anon'
+        return hashlib.sha256(f"{scope} {url}".encode()).hexdigest()
+
+    def lookup(self, key):
+        """Return (etag, last_modified, link, body) for a cached response, or None"""
+        with self.lock:
+            row = self.conn.execute(
+                'SELECT etag, last_modified, link, body FROM http_cache WHERE cache_key = ?', (key,)
+            ).fetchone()
+            if row is not None:
+                self.conn.execute('UPDATE http_cache SET last_access = ? WHERE cache_key = ?', (time.time(), key))
+        return row
+
+    def store(self, key, url, response):
+        """Remember a 200 response if GitHub gave us a validator for it"""
+        etag = response.headers.get('ETag')
+        last_modified = response.headers.get('Last-Modified')
+        if not etag and not last_modified:
+            return
+        body = response.content
+        with self.lock:
+            old = self.conn.execute('SELECT size FROM http_cache WHERE cache_key = ?', (key,)).fetchone()
+            self.conn.execute('''
+            INSERT OR REPLACE INTO http_cache (cache_key, url, etag, last_modified, link, body, size, last_access)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            ''', (key, url, etag, last_modified, response.headers.get('Link'), body, len(body), time.time()))
+            self.total_bytes += len(body) - (old[0] if old else 0)
+            if self.total_bytes > self.max_bytes:
+                self._evict()
+
+    def _evict(self):
+        """Drop least recently used entries until the cache is back under 90% of its budget"""
+        # Other processes (the app, the refresh worker) write to the same file
+        self.total_bytes = self.conn.execute('SELECT COALESCE(SUM(size), 0) FROM http_cache').fetchone()[0]
+        target = self.max_bytes * 0.9
+        rows = self.conn.execute('SELECT cache_key, size FROM http_cache ORDER BY last_access').fetchall()
+        evicted = []
+        for key, size in rows:
+            if self.total_bytes <= target:
+                break
+            evicted.append((key,))
+            self.total_bytes -= size
+        self.conn.executemany('DELETE FROM http_cache WHERE cache_key = ?', evicted)
+
+_response_cache = None
+_response_cache_lock = threading.Lock()
+
+def get_response_cache():
+    """Process-wide ResponseCache, created on first use
+    
+    Every RequestScheduler shares it, so one byte count bounds the file and the
+    cache database is opened once per process rather than once per refresh.
+    """
+    global _response_cache
+    with _response_cache_lock:
+        if _response_cache is None:
+            _response_cache = ResponseCache()
+        return _response_cache
+
+def parse_tokens(text):
+    """Split tokens given as one string, separated by commas, spaces or newlines"""
+    return [token for token in re.split(r'[\s,]+', text or '') if token]
+
+class TokenPool:
+    """GitHub tokens whose remaining quota and reset time are tracked per token and resource
+    
+    Each request goes to the token with the most headroom; a token that is exhausted is
+    held back until its reset, and only when every token is exhausted does a request
+    wait for the earliest reset. A pool can be passed wherever a token is accepted.
+    """
+    def __init__(self, tokens):
+        if isinstance(tokens, str):
+            tokens = parse_tokens(tokens)
+        self.tokens = list(dict.fromkeys(token for token in tokens if token))
+        self.lock = threading.Lock()
+        # {(token, resource): {'remaining': int or None, 'reset_at': float, 'next_slot': float}}
+        self.limits = {}
+
+    def __len__(self):
+        return len(self.tokens)
+
+    def __repr__(self):
+        # Never show the tokens themselves
+        return f"TokenPool({len(self.tokens)} tokens)"
+
+    def _quota(self, token, resource):
+        return self.limits.setdefault((token, resource), {'remaining': None, 'reset_at': 0.0, 'next_slot': 0.0})
+
+    def _available_at(self, quota, now):
+        if quota['remaining'] is not None and quota['remaining'] <= 0 and quota['reset_at'] > now:
+            return quota['reset_at']
+        return max(now, quota['next_slot'])
+
+    def reserve(self, resource, not_before=0.0, max_wait=MAX_RATE_LIMIT_WAIT):
+        """Pick the token to send the next request with, returning (token, seconds to wait first)
+        
+        Raises RateLimitExceeded if no token is usable within max_wait, because each one is
+        either exhausted or paced further apart than that; reset_at is when the best one
+        frees up. Anonymous requests use a pool with no tokens and a single unauthenticated quota.
+        """
+        with self.lock:
+            now = time.time()
+            candidates = []
+            for token in self.tokens or [None]:
+                quota = self._quota(token, resource)
+                # Soonest available first, then the most remaining; an unknown quota hasn't been used yet
+                remaining = quota['remaining'] if quota['remaining'] is not None else float('inf')
+                candidates.append((self._available_at(quota, now), -remaining, token))
+            _, _, token = min(candidates, key=lambda candidate: candidate[:2])
+            quota = self._quota(token, resource)
+            remaining, reset_at = quota['remaining'], quota['reset_at']
+            start = max(self._available_at(quota, now), not_before)
+            if start - now > max_wait:
+                raise RateLimitExceeded(start)
+            # Pace requests once the quota is running low so we don't stall on the last few
+            if remaining is not None and 0 < remaining < PACING_THRESHOLD and reset_at > start:
+                quota['next_slot'] = start + (reset_at - start) / remaining
+            else:
+                quota['next_slot'] = start
+            if remaining is not None and remaining > 0:
+                quota['remaining'] = remaining - 1
+        return token, start - now
+
+    def record(self, token, response, resource):
+        """Update a token's quota from X-RateLimit-* headers, returning the resource they were for"""
+        remaining = response.headers.get('X-RateLimit-Remaining')
+        reset = response.headers.get('X-RateLimit-Reset')
+        resource = response.headers.get('X-RateLimit-Resource', resource)
+        with self.lock:
+            quota = self._quota(token, resource)
+            if remaining is not None:
+                quota['remaining'] = int(remaining)
+            if reset is not None:
+                quota['reset_at'] = float(reset)
+            # The panel shows what the whole pool has left
+            known = [quota['remaining'] for (_, name), quota in self.limits.items()
+                     if name == resource and quota['remaining'] is not None]
+        if known:
+            perf.gauge(f'rate_limit.remaining.{resource}', sum(known))
+        return resource
+
+    def status(self):
+        """Quota of every token as a list of dicts, with tokens masked for display"""
+        with self.lock:
+            return [
+                {'token': f"…{token[-4:]}" if token else "anonymous", 'resource': resource,
+                 'remaining': quota['remaining'],
+                 'reset_at': datetime.fromtimestamp(quota['reset_at']) if quota['reset_at'] else None}
+                for (token, resource), quota in sorted(self.limits.items(), key=lambda item: str(item[0]))
+            ]
+
+_token_pools = {}
+_token_pools_lock = threading.Lock()
+
+def get_token_pool(tokens):
+    """Process-wide TokenPool for a list or string of tokens
+    
+    Reusing the pool lets the quotas learned during one refresh carry over to the next,
+    even though each refresh has its own RequestScheduler.
+    """
+    if isinstance(tokens, TokenPool):
+        return tokens
+    if tokens is None or isinstance(tokens, str):
+        tokens = parse_tokens(tokens)
+    key = tuple(dict.fromkeys(token for token in tokens if token))
+    with _token_pools_lock:
+        if key not in _token_pools:
+            _token_pools[key] = TokenPool(key)
+        return _token_pools[key]
+
+class RequestScheduler:
+    """Send GitHub API requests while honouring primary and secondary rate limits"""
+    def __init__(self, session=None, pool_size=DEFAULT_MAX_WORKERS,
+                 max_retries=5, max_wait=MAX_RATE_LIMIT_WAIT, cache=None):
+        self.session = session or create_session(pool_size)
+        self.cache = cache if cache is not None else get_response_cache()
+        self.max_retries = max_retries
+        self.max_wait = max_wait
+        self.lock = threading.Lock()
+        self.paused_until = 0.0
+
+    @staticmethod
+    def _resource(url):
+        return 'graphql' if url == GITHUB_GRAPHQL_URL else 'core'
+
+    def _reserve_slot(self, pool, resource):
+        """Block until a request may be sent and return the token to send it with"""
+        with self.lock:
+            paused_until = self.paused_until
+        token, wait = pool.reserve(resource, paused_until, self.max_wait)
+        if wait > 0:
+            time.sleep(wait)
+        return token
+
+    def _backoff(self, seconds):
+        """Pause every worker for the given number of seconds"""
+        with self.lock:
+            self.paused_until = max(self.paused_until, time.time() + seconds)
+
+    def _retry_delay(self, response, attempt):
+        """Seconds to wait before retrying response, or None if it shouldn't be retried"""
+        if response.status_code in (403, 429):
+            retry_after = response.headers.get('Retry-After')
+            if retry_after is not None:
+                return float(retry_after)
+            if response.headers.get('X-RateLimit-Remaining') == '0':
+                reset = float(response.headers.get('X-RateLimit-Reset', 0))
+                return max(reset - time.time(), 1)
+            if response.status_code == 429 or 'rate limit' in response.text.lower():
+                # Secondary limit without guidance: wait at least a minute per GitHub's docs
+                return 60 * (2 ** attempt)
+            return None
+        if response.status_code >= 500:
+            return 2 ** attempt
+        return None
+
+    def get(self, url, token=None):
+        """GET a GitHub API URL, answering from the response cache when GitHub says 304"""
+        return self.request('GET', url, token)
+
+    def post(self, url, payload, token=None):
+        """POST a JSON payload, e.g. a GraphQL query"""
+        return self.request('POST', url, token, payload)
+
+    def request(self, method, url, token=None, payload=None):
+        """Send a request, retrying on rate limits and transient failures
+        
+        token may be a single token or a TokenPool; each attempt is authorized with
+        the pool's token that has the most headroom.
+        """
+        # A single token is a pool of one, so every token's quota is tracked on its own
+        pool = get_token_pool([token] if isinstance(token, str) else token)
+        headers = {}
+        resource = self._resource(url)
+        use_cache = method == 'GET' and self.cache
+        cache_key = self.cache.key(url, token) if use_cache else None
+        cached = self.cache.lookup(cache_key) if use_cache else None
+        if cached:
+            etag, last_modified = cached[0], cached[1]
+            if etag:
+                headers['If-None-Match'] = etag
+            if last_modified:
+                headers['If-Modified-Since'] = last_modified
+            perf.count('http.conditional')
+        for attempt in range(self.max_retries + 1):
+            current = self._reserve_slot(pool, resource)
+            if current:
+                headers['Authorization'] = f'token {current}'
+            try:
+                response = self.session.request(method, url, headers=headers, json=payload, timeout=30)
+            except (requests.ConnectionError, requests.Timeout):
+                if attempt == self.max_retries:
+                    raise
+                self._backoff(2 ** attempt)
+                continue
+            pool.record(current, response, resource)
+            perf.count('http.requests')
+            perf.count('http.bytes', len(response.content))
+            if attempt:
+                perf.count('http.retries')
+            if response.status_code == 304 and cached:
+                perf.count('http.not_modified')
+                return self._from_cache(response, cached)
+            if response.status_code == 200 and use_cache:
+                self.cache.store(cache_key, url, response)
+            if attempt < self.max_retries and len(pool) > 1 and response.status_code in (403, 429) \
+                    and response.headers.get('X-RateLimit-Remaining') == '0':
+                # This token is held back until its reset; retry right away with the next one
+                continue
+            delay = self._retry_delay(response, attempt)
+            if delay is None or attempt == self.max_retries:
+                return response
+            if delay > self.max_wait:
+                raise RateLimitExceeded(time.time() + delay)
+            self._backoff(delay)
+        return response
+
+    @staticmethod
+    def _from_cache(response, cached):
+        """Turn a 304 Not Modified into the 200 response it stands for"""
+        link, body = cached[2], cached[3]
+        response.status_code = 200
+        response._content = body
+        if link:
+            response.headers['Link'] = link
+        response.from_cache = True
+        return response
+
+def with_query(url, **params):
+    """Return url with the given query parameters set, replacing existing values"""
+    parts = urlsplit(url)
+    query = dict(parse_qsl(parts.query))
+    query.update({key: str(value) for key, value in params.items()})
+    return urlunsplit(parts._replace(query=urlencode(query)))
+
+def fetch_page(url, token=None, scheduler=None, jobs=None):
+    """Fetch one page of a list endpoint as {'items', 'next', 'last'}, or None on failure"""
+    job = jobs.get('page', url) if jobs else None
+    if job and job[0] == 'done':
+        return job[1]
+    response = (scheduler or RequestScheduler()).get(url, token)
+    if response.status_code != 200:
+        return None
+    page = {
+        'items': response.json(),
+        'next': response.links.get('next', {}).get('url'),
+        'last': response.links.get('last', {}).get('url'),
+    }
+    if jobs:
+        jobs.complete('page', url, page)
+    return page
+
+@timed('github.fetch_all_pages')
+def fetch_all_pages(url, token=None, scheduler=None, jobs=None, executor=None, max_pages=None):
+    """Return every item of a paginated list endpoint in order, reusing pages stored in the job queue
+    
+    The first page's Link: last header gives the page count, so the remaining pages
+    are requested in parallel on executor (bounded by its worker count). With max_pages,
+    only the items on the first max_pages pages are returned.
+    """
+    scheduler = scheduler or RequestScheduler()
+    first_url = with_query(url, per_page=PER_PAGE, page=1)
+    first = fetch_page(first_url, token, scheduler, jobs)
+    if first is None:
+        return None
+    
+    if first['next'] and not first['last']:
+        # No page count to go on: walk Link: next one page at a time
+        results = list(first['items'])
+        url = first['next']
+        pages_read = 1
+        while url and (max_pages is None or pages_read < max_pages):
+            page = fetch_page(url, token, scheduler, jobs)
+            pages_read += 1
+            if page is None:
+                return None
+            results.extend(page['items'])
+            url = page['next']
+        return results
+    
+    last_page = int(dict(parse_qsl(urlsplit(first['last']).query)).get('page', 1)) if first['last'] else 1
+    if max_pages is not None:
+        last_page = min(last_page, max_pages)
+    page_urls = [with_query(url, per_page=PER_PAGE, page=number) for number in range(2, last_page + 1)]
+    
+    own_executor = executor is None and len(page_urls) > 0
+    if own_executor:
+        executor = ThreadPoolExecutor(max_workers=DEFAULT_MAX_WORKERS)
+    try:
+        fetch = in_run_context(lambda page_url: fetch_page(page_url, token, scheduler, jobs))
+        pages = [first] + list(executor.map(fetch, page_urls))
+    finally:
+        if own_executor:
+            executor.shutdown(wait=True, cancel_futures=True)
+    
+    if any(page is None for page in pages):
+        return None
+    return [item for page in pages for item in page['items']]
+
+@timed('github.get_user_profile')
+def get_user_profile(username, token=None, scheduler=None, raise_errors=False):
+    """Fetch detailed profile information for a given username
+    
+    Returns None if the account doesn't exist. Other failures (e.g. a 5xx that outlasted
+    the retries) also return None, or raise requests.HTTPError with raise_errors.
+    """
+    url = f"{GITHUB_API_URL}/users/{username}"
+    response = (scheduler or RequestScheduler()).get(url, token)
+    if response.status_code == 200:
+        return response.json()
+    if raise_errors and response.status_code != 404:
+        raise requests.HTTPError(f"Profile lookup failed with status {response.status_code}", response=response)
+    return None
+
+def get_user_profiles_rest(usernames, token=None, scheduler=None):
+    """Fetch profiles with one REST call each, keyed by username; only a 404 gives None"""
+    return {user: get_user_profile(user, token, scheduler, raise_errors=True) for user in usernames}
+
+# repositoryOwner resolves organizations as well as users, like REST /users/{login} does
+PROFILE_FIELDS = '''
+fragment profile on RepositoryOwner {
+    login
+    avatarUrl
+    ... on User {
+        databaseId
+        name
+        bio
+        location
+        repositories(privacy: PUBLIC, ownerAffiliations: OWNER) { totalCount }
+    }
+    ... on Organization {
+        databaseId
+        name
+        bio: description
+        location
+        repositories(privacy: PUBLIC) { totalCount }
+    }
+}
+'''
+
+class GraphQLError(Exception):
+    """Raised when a GraphQL batch can't be answered and should fall back to REST"""
+
+@timed('github.get_user_profiles_graphql')
+def get_user_profiles_graphql(usernames, token, scheduler=None):
+    """Fetch up to GRAPHQL_BATCH_SIZE profiles in one query, shaped like the REST /users response
+    
+    Logins that don't resolve are left out of the result, so the caller can look them up over REST.
+    """
+    usernames = list(usernames)
+    variables = {f"l{i}": user for i, user in enumerate(usernames)}
+    params = ', '.join(f"${name}: String!" for name in variables)
+    fields = '\n'.join(f"u{i}: repositoryOwner(login: $l{i}) {{ ...profile }}" for i in range(len(usernames)))
+    query = f"query({params}) {{\n{fields}\n}}\n{PROFILE_FIELDS}"
+    
+    response = (scheduler or RequestScheduler()).post(
+        GITHUB_GRAPHQL_URL, {'query': query, 'variables': variables}, token
+    )
+    if response.status_code != 200:
+        raise GraphQLError(f"GraphQL request failed with status {response.status_code}")
+    body = response.json()
+    data = body.get('data')
+    if not data:
+        raise GraphQLError(body.get('errors') or 'GraphQL response had no data')
+    
+    # A null node may be a deleted account or one renamed since we saw it; only a REST 404
+    # tells us it is really gone
+    profiles = {}
+    for i, user in enumerate(usernames):
+        node = data.get(f"u{i}")
+        if node:
+            profiles[user] = {
+                'login': node['login'],
+                'id': node['databaseId'],
+                'name': node['name'],
+                'bio': node['bio'],
+                'avatar_url': node['avatarUrl'],
+                'location': node['location'],
+                'public_repos': node['repositories']['totalCount'],
+            }
+    return profiles
+
+def fetch_user_profiles(usernames, token=None, max_workers=DEFAULT_MAX_WORKERS, scheduler=None, jobs=None,
+                        use_graphql=False, failed=None):
+    """Fetch profiles concurrently, yielding (username, profile) pairs as they complete
+    
+    profile is None only for accounts that don't exist. Lookups that fail for another
+    reason (e.g. a 5xx that outlasted the retries) aren't yielded; they are added to the
+    failed set, if given, and stay pending in the job queue.
+    """
+    max_workers = max(1, int(max_workers))
+    scheduler = scheduler or RequestScheduler(pool_size=max_workers)
+    usernames = list(usernames)
+    
+    # Replay lookups finished by an earlier, interrupted run
+    if jobs:
+        jobs.enqueue('profile', usernames)
+        done = jobs.completed('profile')
+        for user in usernames:
+            if user in done:
+                yield user, done[user]
+        usernames = [user for user in usernames if user not in done]
+    
+    # GraphQL needs an authenticated request; anonymous refreshes stay on REST
+    use_graphql = use_graphql and bool(token)
+    # Lookups are charged to the refresh that asked for them
+    lookup_rest = in_run_context(get_user_profiles_rest)
+    lookup_graphql = in_run_context(get_user_profiles_graphql)
+    
+    executor = ThreadPoolExecutor(max_workers=max_workers)
+    try:
+        # Each future resolves to {username: profile}, for one REST lookup or one GraphQL batch
+        futures = {}
+        if use_graphql:
+            for start in range(0, len(usernames), GRAPHQL_BATCH_SIZE):
+                batch = usernames[start:start + GRAPHQL_BATCH_SIZE]
+                futures[executor.submit(lookup_graphql, batch, token, scheduler)] = batch
+        else:
+            for user in usernames:
+                futures[executor.submit(lookup_rest, [user], token, scheduler)] = [user]
+        
+        while futures:
+            finished, _ = wait(futures, return_when=FIRST_COMPLETED)
+            for future in finished:
+                batch = futures.pop(future)
+                try:
+                    result = future.result()
+                except GraphQLError:
+                    # Fall back to one REST lookup per user in the failed batch
+                    for user in batch:
+                        futures[executor.submit(lookup_rest, [user], token, scheduler)] = [user]
+                    continue
+                except requests.RequestException:
+                    # Transient failures stay pending, so a resumed run looks these users up again
+                    if failed is not None:
+                        failed.update(batch)
+                    continue
+                # Logins a GraphQL batch couldn't resolve get a REST lookup of their own
+                for user in batch:
+                    if user not in result:
+                        futures[executor.submit(lookup_rest, [user], token, scheduler)] = [user]
+                for user, profile in result.items():
+                    if jobs:
+                        jobs.complete('profile', user, profile)
+                    yield user, profile
+    finally:
+        # Don't start queued lookups once we've stopped consuming, e.g. on a rate limit
+        executor.shutdown(wait=True, cancel_futures=True)
+        if jobs:
+            jobs.flush()
+
+def get_github_data(username, token=None, scheduler=None, jobs=None, max_workers=DEFAULT_MAX_WORKERS,
+                    max_pages=None):
+    """Fetch followers and following side by side, sharing one bounded pool for their pages
+    
+    max_pages caps the pages read from each list, e.g. to sample a popular account.
+    """
+    base_url = f"{GITHUB_API_URL}/users/{username}"
+    with ThreadPoolExecutor(max_workers=max(1, int(max_workers))) as page_pool, \
+            ThreadPoolExecutor(max_workers=2) as list_pool:
+        fetch = in_run_context(fetch_all_pages)
+        followers_future = list_pool.submit(fetch, f"{base_url}/followers", token, scheduler, jobs,
+                                            page_pool, max_pages)
+        following_future = list_pool.submit(fetch, f"{base_url}/following", token, scheduler, jobs,
+                                            page_pool, max_pages)
+        followers = followers_future.result()
+        following = following_future.result()
+    
+    if followers is not None and following is not None:
+        return {
+            'followers': [f['login'] for f in followers],
+            'following': [f['login'] for f in following],
+            # GitHub's numeric ids, which identify an account across renames
+            'ids': {f['login']: f.get('id') for f in followers + following},
+        }
+    return None
+
+@timed('github.get_new_connections')
+def get_new_connections(username, relation, known, expected_count, token=None, scheduler=None, jobs=None):
+    """Items of username's followers or following list that aren't in known, or None if that doesn't add up
+    
+    GitHub lists the most recent connections first, so pages are read from the start
+    until the known and new logins reach expected_count (the count from the /users
+    document). A page with nothing new before that, or more logins than expected,
+    means connections were also removed or the order isn't what we assume; None
+    tells the caller to paginate the whole list instead.
+    """
+    if expected_count is None or expected_count < len(known):
+        return None
+    new_items = {}
+    url = with_query(f"{GITHUB_API_URL}/users/{username}/{relation}", per_page=PER_PAGE, page=1)
+    while url and len(known) + len(new_items) < expected_count:
+        page = fetch_page(url, token, scheduler, jobs)
+        if page is None:
+            return None
+        fresh = [item for item in page['items'] if item['login'] not in known]
+        if not fresh:
+            return None
+        new_items.update((item['login'], item) for item in fresh)
+        url = page['next']
+    if len(known) + len(new_items) != expected_count:
+        return None
+    return list(new_items.values())
@@ -0,0 +1,178 @@
+"""Lightweight timing spans and counters for the fetch, store and render hot paths
+
+Hooks in the API client, pipeline, database and tabs report into the process-wide
+`perf` recorder. A perf_run() block also gets a recorder of its own, which receives
+only what is recorded in the context that opened the block, and turns it into one
+run record that is logged as a JSON line and can be stored in the perf_runs table.
+Runs that overlap in time, e.g. accounts refreshed side by side, are therefore
+charged only for their own work. Work handed to an executor thread is attributed to
+the run that submitted it when the function is wrapped with in_run_context().
+"""
+import contextvars
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from functools import wraps
+from logging.handlers import RotatingFileHandler
+
+# JSON lines with one record per run; set PERF_LOG_PATH to an empty string to disable
+PERF_LOG_PATH = os.environ.get('PERF_LOG_PATH', 'data/perf_log.jsonl')
+PERF_LOG_MAX_BYTES = 10 * 1024 * 1024
+
+logger = logging.getLogger('github_followers.perf')
+_handler_lock = threading.Lock()
+
+class PerfRecorder:
+    """Thread-safe accumulator of timing spans, counters and last-seen gauges"""
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            # {name: [count, total_seconds, max_seconds]}
+            self.spans = {}
+            self.counters = {}
+            self.gauges = {}
+
+    def add_span(self, name, seconds):
+        with self.lock:
+            span = self.spans.setdefault(name, [0, 0.0, 0.0])
+            span[0] += 1
+            span[1] += seconds
+            span[2] = max(span[2], seconds)
+
+    @contextmanager
+    def span(self, name):
+        """Time the enclosed block under name, even if it raises"""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_span(name, time.perf_counter() - started)
+
+    def count(self, name, value=1):
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def gauge(self, name, value):
+        with self.lock:
+            self.gauges[name] = value
+
+    def snapshot(self):
+        with self.lock:
+            return {
+                'spans': {name: list(span) for name, span in self.spans.items()},
+                'counters': dict(self.counters),
+                'gauges': dict(self.gauges),
+            }
+
+# Recorders of the perf_run blocks open in the current context, innermost last
+_active_runs = contextvars.ContextVar('perf_active_runs', default=())
+
+class ProcessRecorder(PerfRecorder):
+    """The process-wide recorder, which also reports into every perf_run open in the caller's context"""
+    def add_span(self, name, seconds):
+        super().add_span(name, seconds)
+        for run in _active_runs.get():
+            run.add_span(name, seconds)
+
+    def count(self, name, value=1):
+        super().count(name, value)
+        for run in _active_runs.get():
+            run.count(name, value)
+
+    def gauge(self, name, value):
+        super().gauge(name, value)
+        for run in _active_runs.get():
+            run.gauge(name, value)
+
+perf = ProcessRecorder()
+
+def in_run_context(func):
+    """Wrap func so that, run on another thread, it reports into the perf runs open here"""
+    runs = _active_runs.get()
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        token = _active_runs.set(runs)
+        try:
+            return func(*args, **kwargs)
+        finally:
+            _active_runs.reset(token)
+    return wrapper
+
+def timed(name):
+    """Decorator recording every call of the function as a span"""
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            with perf.span(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+def _ratio(hits, total):
+    return round(hits / total, 4) if total else None
+
+def summarize(snapshot):
+    """Spans and counters of one run's recorder, with derived rates"""
+    spans = {name: {'count': count, 'seconds': round(total, 6), 'max_seconds': round(longest, 6)}
+             for name, (count, total, longest) in snapshot['spans'].items()}
+    counters = snapshot['counters']
+
+    requests = counters.get('http.requests', 0)
+    not_modified = counters.get('http.not_modified', 0)
+    connections_hits = counters.get('connections_cache.hits', 0)
+    avatar_hits = counters.get('avatar_cache.hits', 0)
+    return {
+        'spans': spans,
+        'counters': counters,
+        'http_requests': requests,
+        'http_bytes': counters.get('http.bytes', 0),
+        # A 304 answered from the response cache is free on GitHub; everything else draws on the quota
+        'http_cache_hit_rate': _ratio(not_modified, counters.get('http.conditional', 0)),
+        'quota_used': requests - not_modified,
+        'rate_limit_remaining': {name.rsplit('.', 1)[1]: value for name, value in snapshot['gauges'].items()
+                                 if name.startswith('rate_limit.remaining.')},
+        'connections_cache_hit_rate': _ratio(connections_hits,
+                                             connections_hits + counters.get('connections_cache.misses', 0)),
+        'avatar_cache_hit_rate': _ratio(avatar_hits, avatar_hits + counters.get('avatar_cache.misses', 0)),
+    }
+
+def _log_handler():
+    """Attach the JSON lines file handler once, if a log path is configured"""
+    with _handler_lock:
+        if not PERF_LOG_PATH or logger.handlers:
+            return
+        os.makedirs(os.path.dirname(PERF_LOG_PATH) or '.', exist_ok=True)
+        handler = RotatingFileHandler(PERF_LOG_PATH, maxBytes=PERF_LOG_MAX_BYTES, backupCount=3)
+        handler.setFormatter(logging.Formatter('%(message)s'))
+        logger.addHandler(handler)
+        logger.setLevel(logging.INFO)
+
+@contextmanager
+def perf_run(kind, label=None, on_finish=None):
+    """Collect everything recorded inside the block into a run record
+
+    Only work done in this context, or in functions wrapped with in_run_context here, is
+    counted. Yields a dict that is filled in when the block exits (also on errors), logged
+    as one JSON line and passed to on_finish, e.g. database.record_perf_run.
+    """
+    record = {'kind': kind, 'label': label, 'started_at': datetime.now().isoformat()}
+    recorder = PerfRecorder()
+    context_token = _active_runs.set(_active_runs.get() + (recorder,))
+    started = time.perf_counter()
+    try:
+        yield record
+    finally:
+        record['seconds'] = round(time.perf_counter() - started, 6)
+        _active_runs.reset(context_token)
+        record.update(summarize(recorder.snapshot()))
+        _log_handler()
+        logger.info(json.dumps(record, default=str))
+        if on_finish:
+            on_finish(record)
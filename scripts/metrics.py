@@ -0,0 +1,65 @@
+"""Network metrics computed once per load, from connection rows or from the stored summary"""
+import pandas as pd
+
+class NetworkAggregates:
+    """Counts, ratios and rankings shared by NetworkMetrics and NetworkSummary"""
+    def set_counts(self, network_size, following_count, followers_count, mutual_count):
+        self.network_size = network_size
+        self.following_count = following_count
+        self.followers_count = followers_count
+        self.mutual_count = mutual_count
+        self.only_following_count = following_count - mutual_count
+        self.only_followers_count = followers_count - mutual_count
+        
+        self.influence_ratio = (self.followers_count / self.following_count) if self.following_count > 0 else 0
+        self.engagement_rate = (self.mutual_count / self.following_count * 100) if self.following_count > 0 else 0
+
+    def summary(self):
+        """Key metrics as a two-column table for CSV export"""
+        return pd.DataFrame({
+            "Metric": ["Network Size", "Following", "Followers", "Mutual", "Influence Ratio"],
+            "Value": [self.network_size, self.following_count, self.followers_count, self.mutual_count,
+                      f"{self.influence_ratio:.2f}"]
+        })
+
+class NetworkMetrics(NetworkAggregates):
+    """Counts, partitions, rankings and location histogram for one user's connections
+    
+    Built from the DataFrame returned by get_user_connections (boolean following/follower
+    columns) and shared by every tab, so each rerun scans the network only once.
+    """
+    def __init__(self, connections):
+        self.connections = connections
+        following = connections['following'].to_numpy(dtype=bool)
+        follower = connections['follower'].to_numpy(dtype=bool)
+        
+        # Partitions of the network
+        self.mutual = connections[following & follower]
+        self.not_following_back = connections[following & ~follower]
+        self.follow_back_opportunities = connections[~following & follower]
+        
+        self.set_counts(len(connections), int(following.sum()), int(follower.sum()), len(self.mutual))
+        
+        # Rankings by public repos, most active first
+        self.top_not_following_back = self.not_following_back.nlargest(10, 'public_repos')
+        self.top_follow_back_opportunities = self.follow_back_opportunities.nlargest(5, 'public_repos')
+        
+        # Location histogram, ignoring empty locations
+        locations = connections['location']
+        self.location_counts = locations[locations.notna() & (locations != '')].value_counts()
+
+class NetworkSummary(NetworkAggregates):
+    """The same aggregates as NetworkMetrics, read from the summary written at ingest time
+    
+    Built from get_user_summary without loading any connection rows; it has no
+    connections or partition frames.
+    """
+    def __init__(self, summary):
+        self.set_counts(summary['network_size'], summary['following_count'], summary['followers_count'],
+                        summary['mutual_count'])
+        self.top_not_following_back = pd.DataFrame(summary['top_not_following_back'],
+                                                   columns=['username', 'name', 'public_repos', 'location'])
+        self.top_follow_back_opportunities = pd.DataFrame(summary['top_follow_back'],
+                                                          columns=['username', 'name', 'public_repos', 'location'])
+        self.location_counts = pd.Series(dict(summary['location_counts']), dtype='int64', name='count')
+        self.location_counts.index.name = 'location'
@@ -0,0 +1,126 @@
+"""Set algebra over the follower and following sets of analyzed accounts
+
+Every connection is stored by its GitHub id, which stays the same when the account
+is renamed, and each account's sets are held in memory as sorted unique int64 arrays.
+Overlap, union, difference and Jaccard similarity across any number of accounts are
+then NumPy merges instead of joins on username text.
+"""
+import threading
+from functools import reduce
+
+import numpy as np
+import pandas as pd
+
+from database import get_connection_ids, read_connection
+
+# Which connections make up an account's set in a comparison
+RELATIONS = {
+    'followers': "Followers",
+    'following': "Following",
+    'mutual': "Mutual",
+    'network': "Whole network",
+}
+
+class ConnectionSetIndex:
+    """Sorted id arrays of each analyzed account, reloaded after the account is refreshed"""
+    def __init__(self):
+        self.lock = threading.Lock()
+        # {username: (main_users.last_updated, {relation: array})}
+        self.entries = {}
+
+    def get(self, username, relation='followers'):
+        with read_connection() as conn:
+            row = conn.execute('SELECT last_updated FROM main_users WHERE username = ?', (username,)).fetchone()
+        version = row[0] if row else None
+        with self.lock:
+            entry = self.entries.get(username)
+        if entry is None or entry[0] != version:
+            followers, following = get_connection_ids(username)
+            entry = (version, {
+                'followers': followers,
+                'following': following,
+                'mutual': np.intersect1d(followers, following, assume_unique=True),
+                'network': np.union1d(followers, following),
+            })
+            with self.lock:
+                self.entries[username] = entry
+        return entry[1][relation]
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+connection_sets = ConnectionSetIndex()
+
+class SetComparison:
+    """Overlap, union, difference and Jaccard similarity between the sets of several accounts"""
+    def __init__(self, sets):
+        # {username: sorted unique int64 array}
+        self.sets = sets
+        self.usernames = list(sets)
+
+    @classmethod
+    def load(cls, usernames, relation='followers', index=None):
+        index = index or connection_sets
+        return cls({username: index.get(username, relation) for username in usernames})
+
+    def _arrays(self, usernames):
+        return [self.sets[username] for username in (self.usernames if usernames is None else usernames)]
+
+    def intersection(self, usernames=None):
+        """Ids in the set of every given account (all accounts by default)"""
+        arrays = self._arrays(usernames)
+        if not arrays:
+            return np.zeros(0, dtype=np.int64)
+        return reduce(lambda a, b: np.intersect1d(a, b, assume_unique=True), arrays)
+
+    def union(self, usernames=None):
+        """Ids in the set of any given account (all accounts by default)"""
+        arrays = self._arrays(usernames)
+        if not arrays:
+            return np.zeros(0, dtype=np.int64)
+        return np.unique(np.concatenate(arrays))
+
+    def difference(self, username, others=None):
+        """Ids in username's set but in none of the others (every other account by default)"""
+        others = [other for other in (self.usernames if others is None else others) if other != username]
+        return np.setdiff1d(self.sets[username], self.union(others), assume_unique=True)
+
+    def jaccard(self, first, second):
+        """|A ∩ B| / |A ∪ B| of two accounts' sets, 0 when both are empty"""
+        overlap = len(np.intersect1d(self.sets[first], self.sets[second], assume_unique=True))
+        union = len(self.sets[first]) + len(self.sets[second]) - overlap
+        return overlap / union if union else 0.0
+
+    def membership(self):
+        """(ids, matrix) where matrix[i, j] is 1 if ids[j] is in the set of the i-th account"""
+        ids = self.union()
+        matrix = np.zeros((len(self.usernames), len(ids)), dtype=np.int32)
+        for i, array in enumerate(self._arrays(None)):
+            matrix[i, np.searchsorted(ids, array)] = 1
+        return ids, matrix
+
+    def overlap_matrix(self):
+        """Pairwise intersection sizes; the diagonal holds each set's size"""
+        _, matrix = self.membership()
+        return pd.DataFrame(matrix @ matrix.T, index=self.usernames, columns=self.usernames)
+
+    def jaccard_matrix(self):
+        """Pairwise Jaccard similarity of every account's set"""
+        overlap = self.overlap_matrix().to_numpy()
+        sizes = np.diag(overlap)
+        union = sizes[:, None] + sizes[None, :] - overlap
+        similarity = np.divide(overlap, union, out=np.zeros(overlap.shape), where=union > 0)
+        return pd.DataFrame(similarity, index=self.usernames, columns=self.usernames)
+
+    def summary(self):
+        """Per account: set size, ids no other compared account has, and ids every account shares"""
+        _, matrix = self.membership()
+        exclusive = matrix[:, matrix.sum(axis=0) == 1].sum(axis=1)
+        shared = len(self.intersection())
+        return pd.DataFrame({
+            'username': self.usernames,
+            'size': matrix.sum(axis=1),
+            'exclusive': exclusive,
+            'shared_with_all': shared,
+        })
@@ -0,0 +1,272 @@
+"""Fetch, enrich and save pipeline shared by the Streamlit app and the batch CLI"""
+import time
+from datetime import datetime, timedelta
+
+from avatars import get_avatar_cache
+from database import (
+    DEFAULT_FULL_REFRESH_HOURS,
+    DEFAULT_PROFILE_TTL_HOURS,
+    INGEST_BATCH_SIZE,
+    FetchJobQueue,
+    apply_renames,
+    connections_cache,
+    diff_connections,
+    get_db_connection,
+    get_refresh_state,
+    get_stale_profiles,
+    intern_logins,
+    mark_checked,
+    record_perf_run,
+    write_profiles,
+    write_summary,
+)
+from github_api import (
+    DEFAULT_MAX_WORKERS,
+    RequestScheduler,
+    fetch_user_profiles,
+    get_github_data,
+    get_new_connections,
+    get_user_profile,
+)
+from instrumentation import perf, perf_run, timed
+from network_sets import connection_sets
+
+@timed('pipeline.save_to_database')
+def save_to_database(data, username, token=None, max_workers=DEFAULT_MAX_WORKERS, scheduler=None, jobs=None,
+                     use_graphql=False, incremental=False, profile_ttl_hours=DEFAULT_PROFILE_TTL_HOURS,
+                     progress_callback=None, cache_avatars=False, paginated=True):
+    """Save GitHub data to SQLite database
+    
+    In incremental mode only profiles that are missing or older than profile_ttl_hours
+    are refetched, and only connection rows that changed since the last refresh are written.
+    progress_callback, if given, is called with (profiles_done, profiles_total).
+    With cache_avatars, a thumbnail of every connection's avatar is downloaded once
+    into the local avatar cache. paginated is False when the lists were completed
+    from stored data by probe_changes rather than paginated in full.
+    """
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    
+    current_time = datetime.now().isoformat()
+    
+    # Get all users (followers and following)
+    followers = set(data['followers'])
+    following = set(data['following'])
+    all_users = followers | following
+    
+    # Connections are stored by GitHub id. Accounts renamed since the last refresh are
+    # matched by that id and moved to their new login first, so the rename isn't logged
+    # as an unfollow plus a new follow; logins without a known id get a provisional one
+    with conn:
+        moved = apply_renames(cursor, data.get('ids', {}))
+        ids = intern_logins(cursor, all_users)
+    if moved:
+        # Other analyzed accounts may list the renamed users too
+        connections_cache.clear()
+        connection_sets.clear()
+    follower_ids = {ids[user] for user in followers}
+    following_ids = {ids[user] for user in following}
+    
+    # The diff also feeds the follow/unfollow event log, so it runs in both modes
+    upserts, removals, events = diff_connections(cursor, username, follower_ids, following_ids)
+    if incremental:
+        to_fetch = get_stale_profiles(cursor, all_users, profile_ttl_hours)
+    else:
+        to_fetch = all_users
+        upserts = [(user, user in following_ids, user in follower_ids) for user in follower_ids | following_ids]
+    if jobs:
+        # Lookups that failed during an earlier refresh are retried even if the stored row is fresh
+        retry = (jobs.queued('profile') & all_users).difference(to_fetch)
+        to_fetch = list(to_fetch) + sorted(retry)
+    
+    # Profiles are fetched by a worker pool; writes stay on this thread since
+    # the sqlite connection is not shared across threads. Rows are buffered and
+    # written with executemany, one short transaction per batch, so the write
+    # lock is never held while waiting on the network.
+    failed = set()
+    profiles = fetch_user_profiles(to_fetch, token, max_workers, scheduler, jobs, use_graphql, failed)
+    profile_rows = []
+    missing_rows = []
+    
+    for i, (user, profile) in enumerate(profiles):
+        if profile:
+            profile_rows.append((
+                user,
+                profile.get('id'),
+                profile.get('name', ''),
+                profile.get('bio', ''),
+                profile.get('avatar_url', ''),
+                profile.get('location', ''),
+                profile.get('public_repos', 0),
+                current_time
+            ))
+        elif incremental:
+            missing_rows.append((user,))
+        else:
+            # The account no longer exists; keep a minimal row so the connection still shows
+            profile_rows.append((user, None, None, None, None, None, None, current_time))
+        
+        if len(profile_rows) + len(missing_rows) >= INGEST_BATCH_SIZE:
+            with conn, perf.span('sqlite.write_profiles'):
+                write_profiles(cursor, profile_rows, missing_rows)
+            profile_rows, missing_rows = [], []
+        
+        if progress_callback:
+            progress_callback(i + 1, len(to_fetch))
+    
+    # A lookup that failed says nothing about the account, so whatever is stored is kept
+    # (or a placeholder added) and the lookup stays queued for the next refresh
+    missing_rows.extend((user,) for user in sorted(failed))
+    
+    with conn, perf.span('sqlite.write_connections'):
+        write_profiles(cursor, profile_rows, missing_rows)
+        
+        # Update or insert the main user
+        cursor.execute('''
+        INSERT INTO main_users (username, last_updated, last_paginated_at, last_checked_at)
+        VALUES (?, ?, ?, ?)
+        ON CONFLICT(username) DO UPDATE SET
+            last_updated = excluded.last_updated,
+            last_paginated_at = COALESCE(excluded.last_paginated_at, main_users.last_paginated_at),
+            last_checked_at = excluded.last_checked_at
+        ''', (username, current_time, current_time if paginated else None, current_time))
+        
+        # Insert or update connection data
+        cursor.executemany('''
+        INSERT INTO connections
+        (main_user, related_id, is_following, is_follower, last_updated)
+        VALUES (?, ?, ?, ?, ?)
+        ON CONFLICT(main_user, related_id) DO UPDATE SET
+            is_following = excluded.is_following,
+            is_follower = excluded.is_follower,
+            last_updated = excluded.last_updated
+        ''', [(username, user, is_following, is_follower, current_time)
+              for user, is_following, is_follower in upserts])
+        
+        # Drop people who neither follow nor are followed any more
+        cursor.executemany('''
+        DELETE FROM connections WHERE main_user = ? AND related_id = ?
+        ''', [(username, user) for user in removals])
+        
+        # Append what changed since the previous refresh to the event log
+        cursor.executemany('''
+        INSERT INTO connection_events (main_user, related_id, relation, action, occurred_at)
+        VALUES (?, ?, ?, ?, ?)
+        ''', [(username, user, relation, action, current_time) for user, relation, action in events])
+        
+        # Aggregates read by the sidebar, History and every render
+        write_summary(cursor, username, followers, following, current_time)
+    
+    if cache_avatars:
+        # Covers profiles reused from earlier refreshes too; already cached thumbnails are skipped
+        cursor.execute('''
+        SELECT u.avatar_url FROM connections c
+        JOIN github_users u ON u.github_id = c.related_id
+        WHERE c.main_user = ? AND u.avatar_url IS NOT NULL AND u.avatar_url != ''
+        ''', (username,))
+        avatar_urls = [row[0] for row in cursor.fetchall()]
+        with perf.span('avatars.fetch_many'):
+            get_avatar_cache().fetch_many(avatar_urls, scheduler.session if scheduler else None, max_workers)
+    
+    conn.close()
+    connections_cache.invalidate(username)
+    
+    # Everything is stored, so the completed checkpoints are no longer needed
+    if jobs:
+        jobs.clear()
+    
+    return True
+
+def probe_changes(username, token=None, scheduler=None, jobs=None, full_refresh_hours=DEFAULT_FULL_REFRESH_HOURS):
+    """Work out username's current lists from its /users document and the stored lists
+    
+    Returns (data, strategy). strategy is 'unchanged' when both counts match the stored
+    lists, so nothing else was requested, or 'delta' when only the new connections at
+    the start of a list were paged in. (None, 'full') means both lists have to be
+    paginated: there's no stored data, the last full pass is older than
+    full_refresh_hours, the probe failed, or the counts don't add up (e.g. an unfollow).
+    """
+    state = get_refresh_state(username)
+    if state is None or not state['last_paginated_at']:
+        return None, 'full'
+    if datetime.fromisoformat(state['last_paginated_at']) < datetime.now() - timedelta(hours=full_refresh_hours):
+        return None, 'full'
+    with perf.span('github.probe'):
+        profile = get_user_profile(username, token, scheduler)
+    if not profile:
+        return None, 'full'
+    
+    data = {'ids': {}}
+    strategy = 'unchanged'
+    for relation in ('followers', 'following'):
+        known = state[relation]
+        if profile.get(relation) == len(known):
+            data[relation] = list(known)
+            continue
+        new_items = get_new_connections(username, relation, known, profile.get(relation), token, scheduler, jobs)
+        if new_items is None:
+            return None, 'full'
+        data[relation] = list(known) + [item['login'] for item in new_items]
+        data['ids'].update((item['login'], item.get('id')) for item in new_items)
+        strategy = 'delta'
+    return data, strategy
+
+def refresh_account(username, token=None, scheduler=None, max_workers=DEFAULT_MAX_WORKERS, use_graphql=False,
+                    incremental=False, profile_ttl_hours=DEFAULT_PROFILE_TTL_HOURS, progress_callback=None,
+                    cache_avatars=False, full_refresh_hours=DEFAULT_FULL_REFRESH_HOURS):
+    """Fetch, enrich and store one account, returning refresh statistics or None if GitHub refused
+    
+    Incremental refreshes probe the account first (see probe_changes) unless
+    full_refresh_hours is 0; the statistics say which strategy was used. Work is
+    checkpointed in the job queue, so if RateLimitExceeded or a network error escapes,
+    calling this again within FETCH_JOB_MAX_AGE_HOURS resumes where it stopped. Every
+    call, successful or not, is recorded as a perf run; the statistics include that
+    record under 'perf'.
+    """
+    scheduler = scheduler or RequestScheduler(pool_size=max_workers)
+    jobs = FetchJobQueue(username)
+    started = time.perf_counter()
+    profiles_done = [0]
+    
+    def track_progress(done, total):
+        profiles_done[0] = done
+        if progress_callback:
+            progress_callback(done, total)
+    
+    with perf_run('refresh', username, on_finish=record_perf_run) as run:
+        # Anything that escapes is recorded as an error
+        run['status'] = 'error'
+        try:
+            data, strategy = None, 'full'
+            if incremental and full_refresh_hours:
+                data, strategy = probe_changes(username, token, scheduler, jobs, full_refresh_hours)
+            run['strategy'] = strategy
+            if strategy == 'full':
+                with perf.span('github.get_github_data'):
+                    data = get_github_data(username, token, scheduler, jobs, max_workers)
+                if not data:
+                    # Pages fetched before the refusal would be replayed by a later refresh as
+                    # if they were current, so drop them rather than resuming from them
+                    jobs.clear()
+                    run['status'] = 'refused'
+                    return None
+            if strategy == 'unchanged':
+                # Nothing to store: stale profiles wait for the next refresh that finds changes
+                mark_checked(username)
+                jobs.clear()
+            else:
+                save_to_database(data, username, token, max_workers, scheduler, jobs, use_graphql, incremental,
+                                 profile_ttl_hours, track_progress, cache_avatars, paginated=strategy == 'full')
+            run['status'] = 'ok'
+        finally:
+            jobs.close()
+    
+    return {
+        'username': username,
+        'followers': len(data['followers']),
+        'following': len(data['following']),
+        'profiles_fetched': profiles_done[0],
+        'strategy': strategy,
+        'seconds': time.perf_counter() - started,
+        'perf': run,
+    }
@@ -0,0 +1,391 @@
+"""Background refresh worker that runs refresh jobs outside the Streamlit script run
+
+    python scripts/worker.py          # standalone worker for queued and scheduled refreshes
+
+Jobs live in the refresh_jobs table, so the UI only submits them and polls their
+progress, and a browser reload doesn't interrupt anything. Accounts in
+refresh_schedules are re-queued once their interval has passed since the last
+refresh. Tokens are never written to the database: they stay in the memory of the
+process that received them, and a standalone worker falls back to $GITHUB_TOKENS
+(comma-separated) or $GITHUB_TOKEN. A job submitted with such a token is owned by
+that process's worker and only run by it, unless the process stops.
+"""
+import json
+import os
+import socket
+import sqlite3
+import sys
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta
+
+import requests
+
+from database import (
+    DEFAULT_FULL_REFRESH_HOURS,
+    DEFAULT_PROFILE_TTL_HOURS,
+    get_db_connection,
+    initialize_database,
+    read_connection,
+)
+from github_api import DEFAULT_MAX_WORKERS, RateLimitExceeded, RequestScheduler, get_token_pool
+from pipeline import refresh_account
+
+# Options a job may carry; scheduled refreshes use these defaults
+DEFAULT_JOB_OPTIONS = {
+    'max_workers': DEFAULT_MAX_WORKERS,
+    'use_graphql': True,
+    'incremental': True,
+    'profile_ttl_hours': DEFAULT_PROFILE_TTL_HOURS,
+    'cache_avatars': True,
+    'full_refresh_hours': DEFAULT_FULL_REFRESH_HOURS,
+}
+
+# Job messages for each refresh strategy of refresh_account
+STRATEGY_MESSAGES = {
+    'unchanged': "no changes since the last refresh",
+    'delta': "new connections paged in",
+    'full': "fully paginated",
+}
+
+ACTIVE_JOB_STATUSES = ('queued', 'running')
+
+# Seconds between checks for new jobs and due schedules when the queue is idle
+POLL_INTERVAL = 2.0
+
+# Minimum seconds between progress writes of a running job
+PROGRESS_INTERVAL = 0.5
+
+# A running job whose worker hasn't reported for this long is assumed dead and re-queued;
+# the fetch job queue lets the next attempt resume where it stopped. Workers whose
+# heartbeat is this old no longer hold on to the jobs they own.
+STALE_JOB_SECONDS = 600
+
+# Seconds between heartbeats of a worker and the job it is running, whatever the job is doing
+HEARTBEAT_INTERVAL = 30
+
+def submit_job(username, options=None, owner=None):
+    """Queue a refresh of username, returning the job id (an already active job is reused)
+    
+    owner is the id of the worker that holds the job's token; only that worker claims it.
+    """
+    options = {**DEFAULT_JOB_OPTIONS, **(options or {})}
+    conn = get_db_connection()
+    with conn:
+        row = conn.execute('''
+        SELECT id, owner FROM refresh_jobs
+        WHERE username = ? AND status IN ('queued', 'running')
+        ORDER BY id LIMIT 1
+        ''', (username,)).fetchone()
+        if row:
+            job_id = row[0]
+            if owner and row[1] is None:
+                # A queued job nobody has a token for goes to the worker that has one
+                conn.execute("UPDATE refresh_jobs SET owner = ? WHERE id = ? AND status = 'queued'",
+                             (owner, job_id))
+        else:
+            job_id = conn.execute('''
+            INSERT INTO refresh_jobs (username, status, options, submitted_at, owner)
+            VALUES (?, 'queued', ?, ?, ?)
+            ''', (username, json.dumps(options), datetime.now().isoformat(), owner)).lastrowid
+    conn.close()
+    return job_id
+
+def claim_job(conn, worker_id=None):
+    """Mark the oldest runnable queued job as running and return (id, username, options), or None
+    
+    Only jobs without an owner, or owned by worker_id, are claimed.
+    """
+    now = datetime.now().isoformat()
+    while True:
+        row = conn.execute('''
+        SELECT id, username, options FROM refresh_jobs
+        WHERE status = 'queued' AND (run_after IS NULL OR run_after <= ?) AND (owner IS NULL OR owner = ?)
+        ORDER BY id LIMIT 1
+        ''', (now, worker_id)).fetchone()
+        if row is None:
+            return None
+        with conn:
+            # Another worker process may have claimed it in the meantime
+            claimed = conn.execute('''
+            UPDATE refresh_jobs SET status = 'running', started_at = ?, heartbeat_at = ?, message = NULL
+            WHERE id = ? AND status = 'queued' AND (owner IS NULL OR owner = ?)
+            ''', (now, now, row[0], worker_id)).rowcount
+        if claimed:
+            return row[0], row[1], json.loads(row[2])
+
+def update_job(conn, job_id, **fields):
+    """Set columns of a job and refresh its heartbeat"""
+    fields['heartbeat_at'] = datetime.now().isoformat()
+    assignments = ', '.join(f"{column} = ?" for column in fields)
+    with conn:
+        conn.execute(f'UPDATE refresh_jobs SET {assignments} WHERE id = ?', (*fields.values(), job_id))
+
+def requeue_stale_jobs(conn):
+    """Put running jobs whose worker stopped reporting back in the queue, and release jobs owned by stopped workers"""
+    cutoff = (datetime.now() - timedelta(seconds=STALE_JOB_SECONDS)).isoformat()
+    with conn:
+        conn.execute('''
+        UPDATE refresh_jobs SET status = 'queued', message = 'Resumed after the worker stopped'
+        WHERE status = 'running' AND heartbeat_at < ?
+        ''', (cutoff,))
+        # The token went away with the process, so another worker runs the job with its own
+        conn.execute('''
+        UPDATE refresh_jobs SET owner = NULL, message = 'The app that submitted it stopped; running without its token'
+        WHERE status = 'queued' AND owner IS NOT NULL
+          AND owner NOT IN (SELECT id FROM refresh_workers WHERE heartbeat_at >= ?)
+        ''', (cutoff,))
+        conn.execute('DELETE FROM refresh_workers WHERE heartbeat_at < ?', (cutoff,))
+
+def cancel_job(job_id):
+    """Cancel a job that hasn't started yet; returns False if it is already running or finished"""
+    conn = get_db_connection()
+    with conn:
+        cancelled = conn.execute('''
+        UPDATE refresh_jobs SET status = 'cancelled', finished_at = ?
+        WHERE id = ? AND status = 'queued'
+        ''', (datetime.now().isoformat(), job_id)).rowcount
+    conn.close()
+    return bool(cancelled)
+
+def get_jobs(job_ids):
+    """Current state of the given jobs as a list of dicts, newest first"""
+    if not job_ids:
+        return []
+    placeholders = ', '.join('?' * len(job_ids))
+    with read_connection() as conn:
+        rows = conn.execute(f'''
+        SELECT id, username, status, progress_done, progress_total, message, submitted_at, finished_at
+        FROM refresh_jobs
+        WHERE id IN ({placeholders})
+        ORDER BY id DESC
+        ''', list(job_ids)).fetchall()
+    columns = ['id', 'username', 'status', 'progress_done', 'progress_total', 'message', 'submitted_at',
+               'finished_at']
+    return [dict(zip(columns, row)) for row in rows]
+
+def set_schedule(username, interval_hours):
+    """Refresh username automatically every interval_hours; None or 0 turns it off"""
+    conn = get_db_connection()
+    with conn:
+        if interval_hours:
+            conn.execute('''
+            INSERT INTO refresh_schedules (username, interval_hours)
+            VALUES (?, ?)
+            ON CONFLICT(username) DO UPDATE SET interval_hours = excluded.interval_hours
+            ''', (username, float(interval_hours)))
+        else:
+            conn.execute('DELETE FROM refresh_schedules WHERE username = ?', (username,))
+    conn.close()
+
+def get_schedule(username):
+    """Auto-refresh interval in hours for username, or None"""
+    with read_connection() as conn:
+        row = conn.execute('SELECT interval_hours FROM refresh_schedules WHERE username = ?',
+                           (username,)).fetchone()
+    return row[0] if row else None
+
+def enqueue_due_schedules(conn, owners=None):
+    """Queue a refresh for every scheduled account whose interval has passed, returning their names
+    
+    owners maps usernames to the worker that holds a token for them, which then owns their jobs.
+    """
+    rows = conn.execute('''
+    SELECT s.username, s.interval_hours, m.last_updated, s.last_enqueued_at
+    FROM refresh_schedules s
+    LEFT JOIN main_users m ON m.username = s.username
+    ''').fetchall()
+    now = datetime.now()
+    due = []
+    for username, interval_hours, last_updated, last_enqueued_at in rows:
+        # Counting from the last enqueue too keeps a failing account from being retried every poll
+        last_run = max(filter(None, [last_updated, last_enqueued_at]), default=None)
+        if last_run is None or datetime.fromisoformat(last_run) + timedelta(hours=interval_hours) <= now:
+            due.append(username)
+    for username in due:
+        submit_job(username, owner=(owners or {}).get(username))
+        with conn:
+            conn.execute('UPDATE refresh_schedules SET last_enqueued_at = ? WHERE username = ?',
+                         (now.isoformat(), username))
+    return due
+
+class RefreshWorker:
+    """Daemon thread that claims queued refresh jobs and runs them one at a time
+    
+    A second thread records a heartbeat for the worker and its current job every
+    HEARTBEAT_INTERVAL seconds, so a job stays claimed through long pagination and
+    rate-limit waits for as long as the process is alive.
+    """
+    def __init__(self, default_token=None, poll_interval=POLL_INTERVAL):
+        self.default_token = default_token
+        self.poll_interval = poll_interval
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.lock = threading.Lock()
+        self.wakeup = threading.Event()
+        self.thread = None
+        self.heartbeat_thread = None
+        self.current_job = None
+        # In-memory only: {job_id: token} for submitted jobs, {username: token} for schedules;
+        # a token may be a TokenPool
+        self.job_tokens = {}
+        self.account_tokens = {}
+
+    def start(self):
+        """Start the worker and heartbeat threads if they aren't running yet and return self"""
+        with self.lock:
+            if self.heartbeat_thread is None or not self.heartbeat_thread.is_alive():
+                # Register before anything is submitted, so no other worker releases our jobs
+                conn = get_db_connection()
+                try:
+                    self.beat(conn)
+                finally:
+                    conn.close()
+                self.heartbeat_thread = threading.Thread(target=self.heartbeat, name='refresh-worker-heartbeat',
+                                                         daemon=True)
+                self.heartbeat_thread.start()
+            if self.thread is None or not self.thread.is_alive():
+                self.thread = threading.Thread(target=self.run, name='refresh-worker', daemon=True)
+                self.thread.start()
+        return self
+
+    def beat(self, conn):
+        """Record that this worker, and the job it is running, are alive"""
+        now = datetime.now().isoformat()
+        with conn:
+            conn.execute('''
+            INSERT INTO refresh_workers (id, heartbeat_at) VALUES (?, ?)
+            ON CONFLICT(id) DO UPDATE SET heartbeat_at = excluded.heartbeat_at
+            ''', (self.worker_id, now))
+            job_id = self.current_job
+            if job_id is not None:
+                conn.execute("UPDATE refresh_jobs SET heartbeat_at = ? WHERE id = ? AND status = 'running'",
+                             (now, job_id))
+
+    def heartbeat(self):
+        conn = get_db_connection()
+        try:
+            while True:
+                time.sleep(HEARTBEAT_INTERVAL)
+                try:
+                    self.beat(conn)
+                except sqlite3.OperationalError:
+                    # Database busy with another writer; the next beat is well within STALE_JOB_SECONDS
+                    pass
+        finally:
+            conn.close()
+
+    def submit(self, username, token=None, **options):
+        """Queue a refresh and wake the worker; the token is remembered for later scheduled runs too
+        
+        A job submitted with a token is owned by this worker, since no other process knows the token.
+        """
+        job_id = submit_job(username, options, self.worker_id if token else None)
+        if token:
+            with self.lock:
+                self.job_tokens[job_id] = token
+                self.account_tokens[username] = token
+        self.wakeup.set()
+        return job_id
+
+    def remember_token(self, username, token):
+        """Use token for scheduled refreshes of username while this process lives"""
+        if token:
+            with self.lock:
+                self.account_tokens[username] = token
+
+    def _token(self, job_id, username):
+        with self.lock:
+            return self.job_tokens.pop(job_id, None) or self.account_tokens.get(username) or self.default_token
+
+    def run(self):
+        conn = get_db_connection()
+        try:
+            while True:
+                try:
+                    requeue_stale_jobs(conn)
+                    with self.lock:
+                        owners = {username: self.worker_id for username in self.account_tokens}
+                    enqueue_due_schedules(conn, owners)
+                    job = claim_job(conn, self.worker_id)
+                except sqlite3.OperationalError:
+                    # Database busy with another writer; try again on the next poll
+                    job = None
+                if job is None:
+                    self.wakeup.wait(self.poll_interval)
+                    self.wakeup.clear()
+                    continue
+                self.current_job = job[0]
+                try:
+                    self.run_job(conn, *job)
+                finally:
+                    self.current_job = None
+        finally:
+            conn.close()
+
+    def run_job(self, conn, job_id, username, options):
+        """Run one claimed job, recording progress and the outcome in refresh_jobs"""
+        token = self._token(job_id, username)
+        # Jobs queued before an option existed get its default
+        options = {**DEFAULT_JOB_OPTIONS, **options}
+        last_report = [0.0]
+
+        def report_progress(done, total):
+            now = time.monotonic()
+            if done == total or now - last_report[0] >= PROGRESS_INTERVAL:
+                last_report[0] = now
+                update_job(conn, job_id, progress_done=done, progress_total=total)
+
+        try:
+            stats = refresh_account(
+                username, token, RequestScheduler(pool_size=options['max_workers']), options['max_workers'],
+                options['use_graphql'], options['incremental'], options['profile_ttl_hours'],
+                progress_callback=report_progress, cache_avatars=options['cache_avatars'],
+                full_refresh_hours=options['full_refresh_hours']
+            )
+        except RateLimitExceeded as e:
+            # Progress is checkpointed, so wait for the reset and pick the job up again
+            if token:
+                with self.lock:
+                    self.job_tokens[job_id] = token
+            update_job(conn, job_id, status='queued', message=f"{e}; resuming after the reset",
+                       run_after=datetime.fromtimestamp(e.reset_at).isoformat())
+            return
+        except requests.RequestException as e:
+            update_job(conn, job_id, status='failed', message=f"Network error: {e}",
+                       finished_at=datetime.now().isoformat())
+            return
+        except Exception as e:
+            # Keep the worker alive for the next job; the error is shown with the job
+            update_job(conn, job_id, status='failed', message=f"{type(e).__name__}: {e}",
+                       finished_at=datetime.now().isoformat())
+            return
+
+        if stats:
+            update_job(conn, job_id, status='done', finished_at=datetime.now().isoformat(),
+                       message=f"{stats['followers']} followers, {stats['following']} following, "
+                               f"{stats['profiles_fetched']} profiles fetched in {stats['seconds']:.1f}s "
+                               f"({STRATEGY_MESSAGES[stats['strategy']]}, {stats['perf']['http_requests']} API requests)")
+        else:
+            update_job(conn, job_id, status='failed', finished_at=datetime.now().isoformat(),
+                       message="GitHub API refused the request. Try using a token to get more requests.")
+
+_worker = None
+_worker_lock = threading.Lock()
+
+def get_refresh_worker():
+    """Process-wide worker, started on first use"""
+    global _worker
+    with _worker_lock:
+        if _worker is None:
+            tokens = os.environ.get('GITHUB_TOKENS') or os.environ.get('GITHUB_TOKEN')
+            _worker = RefreshWorker(get_token_pool(tokens) if tokens else None)
+        return _worker.start()
+
+if __name__ == '__main__':
+    initialize_database()
+    print("Refresh worker running; press Ctrl+C to stop", flush=True)
+    try:
+        get_refresh_worker().thread.join()
+    except KeyboardInterrupt:
+        sys.exit(0)